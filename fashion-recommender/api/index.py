@@ -1,4 +1,10 @@
-from backend.main import app
+import sys
+from pathlib import Path
+
+# backend/ modules import each other by flat name (from database import ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from main import app
 
 # This is required for Vercel to find the app
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import argparse
+from datetime import datetime
+
+import motor.motor_asyncio
+
+from carts import CartStore
+
+# Concurrent adds to one cart (think several tabs), with the old read-modify-write
+# endpoint logic and with CartStore. Every add is +1, so the final quantities must add up
+# to the number of requests; anything less is a lost update.
+#
+#   python bench_cart_concurrency.py --adds 200 --products 5 --uri mongodb://localhost:27017
+#
+# Needs a real MongoDB: an in-process mock never interleaves the find and the update, so
+# it can't show the lost updates.
+
+
+async def legacy_add(collection, user_id: str, item: dict):
+    # The pre-CartStore /cart/{userId}/add
+    cart = await collection.find_one({"userId": user_id})
+    if not cart:
+        await collection.insert_one({"userId": user_id, "items": [item], "createdAt": datetime.now(), "updatedAt": datetime.now()})
+    else:
+        items = cart.get("items", [])
+        existing = next((i for i in items if i["productId"] == item["productId"]), None)
+        if existing:
+            existing["quantity"] += item["quantity"]
+        else:
+            items.append(item)
+        await collection.update_one({"userId": user_id}, {"$set": {"items": items, "updatedAt": datetime.now()}})
+    return await collection.find_one({"userId": user_id})
+
+
+async def run(label: str, collection, add, args):
+    user_id = f"bench-{label}"
+    await collection.delete_many({"userId": user_id})
+    items = [{"productId": f"p{i % args.products}", "quantity": 1} for i in range(args.adds)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(add(collection, user_id, item) for item in items), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for r in results if isinstance(r, Exception))
+    carts = await collection.find({"userId": user_id}).to_list(None)
+    total = sum(i["quantity"] for cart in carts for i in cart.get("items", []))
+    print(f"{label:<8} {elapsed * 1000:8.1f}ms  carts {len(carts)}  quantity {total}/{args.adds}  "
+          f"lost {args.adds - total}  errors {errors}")
+    await collection.delete_many({"userId": user_id})
+
+
+async def main(args):
+    collection = motor.motor_asyncio.AsyncIOMotorClient(args.uri)["fashion_bench"]["carts"]
+    await collection.create_index("userId", unique=True)
+
+    store = CartStore(collection)
+
+    async def store_add(coll, user_id, item):
+        return await store.add(user_id, item)
+
+    print(f"{args.adds} concurrent adds over {args.products} products")
+    await run("legacy", collection, legacy_add, args)
+    await run("atomic", collection, store_add, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adds", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    asyncio.run(main(parser.parse_args()))
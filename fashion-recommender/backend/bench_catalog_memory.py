@@ -0,0 +1,78 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from catalog import CatalogSnapshot
+
+# Measures the resident size of the in-memory catalog snapshot (records + ranking matrix)
+# and the cost of candidate lookup and local ranking.
+#
+#   python bench_catalog_memory.py --products 100000
+
+CATEGORIES = [
+    "T-Shirt", "Formal Shirt", "shirt", "Kurta", "Short Kurta", "Jeans", "Chinos", "Joggers",
+    "Formal Trousers", "Jacket", "Blazer", "Bandhgala", "Sherwani", "Kurta Pajama", "Co-ords", "Suit"
+]
+COLORS = ["Black", "White", "Navy", "Beige", "Olive", "Maroon", "Grey", "Blue"]
+TAGS = ["casual", "formal", "party", "wedding", "festive", "work", "summer", "winter", "streetwear"]
+
+
+def synthetic_docs(count: int):
+    for i in range(count):
+        yield {
+            "_id": ObjectId(),
+            "name": f"Product {i} {random.choice(COLORS)} {random.choice(CATEGORIES)}",
+            "category": random.choice(CATEGORIES),
+            "colors": [random.choice(COLORS)],
+            "price": round(random.uniform(10, 400), 2),
+            "imageUrl": f"https://images.example.com/products/{i:08d}.jpg",
+            "tags": random.sample(TAGS, 2),
+            "style": random.choice(["Casual Wear", "Formal Wear", "Ethnic Wear", "Party Wear"]),
+            "description": f"A {random.choice(COLORS).lower()} piece in soft {random.choice(['cotton', 'linen', 'wool', 'denim'])}."
+        }
+
+
+def main(args):
+    docs = list(synthetic_docs(args.products))
+
+    start = time.perf_counter()
+    CatalogSnapshot(docs)
+    build_seconds = time.perf_counter() - start
+
+    # Second build under tracemalloc (which slows allocation down, hence the separate timing)
+    tracemalloc.start()
+    snapshot = CatalogSnapshot(docs)
+    snapshot.candidates("Tops")
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    lookups = 10000
+    for _ in range(lookups):
+        snapshot.candidates(random.choice(["Tops", "Bottoms", "Outerwear", "FullBody"]))[:40]
+    lookup_us = (time.perf_counter() - start) / lookups * 1e6
+
+    hero = docs[0]
+    snapshot.rank_candidates("Tops", hero, "Party", "Men", 12)
+    start = time.perf_counter()
+    for _ in range(lookups // 10):
+        ranked = snapshot.rank_candidates("Tops", hero, "Party", "Men", 12)
+        snapshot.assemble_outfit(ranked)
+    rank_us = (time.perf_counter() - start) / (lookups // 10) * 1e6
+    pool_size = len(snapshot.candidates("Tops"))
+
+    print(f"Products:           {len(snapshot)}")
+    print(f"Snapshot memory:    {current / 1024 / 1024:.1f} MiB")
+    print(f"Per 100k products:  {current / len(snapshot) * 100000 / 1024 / 1024:.1f} MiB")
+    print(f"Build time:         {build_seconds * 1000:.0f}ms")
+    print(f"Candidate lookup:   {lookup_us:.2f}us")
+    print(f"Local ranking:      {rank_us:.0f}us over {pool_size} candidates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import json
+import time
+
+from llm_gateway import LLMGateway, FakeBackend, LLMError
+
+# Offline throughput check for the LLM gateway using the fake backend.
+# Also samples event-loop lag to confirm the loop stays responsive while calls are in flight.
+#
+#   python bench_llm_gateway.py --requests 200 --concurrency 8 --latency-ms 800
+
+PROMPT = json.dumps([{"id": f"c{i}", "name": f"Item {i}"} for i in range(20)])
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list):
+    interval = 0.01
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run(args):
+    gateway = LLMGateway(
+        backend=FakeBackend(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms),
+        max_concurrency=args.concurrency,
+        timeout=args.timeout
+    )
+
+    stop = asyncio.Event()
+    lag_samples = []
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lag_samples))
+
+    async def one():
+        try:
+            await gateway.generate(PROMPT)
+        except LLMError:
+            pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await lag_task
+
+    stats = gateway.stats()
+    print(f"Requests:        {args.requests}")
+    print(f"Concurrency cap: {args.concurrency}")
+    print(f"Elapsed:         {elapsed:.2f}s")
+    print(f"Throughput:      {stats['completed'] / elapsed:.1f} calls/sec")
+    print(f"Timeouts:        {stats['timeouts']}")
+    print(f"Max loop lag:    {max(lag_samples) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=60)
+    asyncio.run(run(parser.parse_args()))
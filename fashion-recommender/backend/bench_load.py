@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+from pathlib import Path
+from typing import Dict, List
+
+# Offline load test: boots the app in-process against mongomock-motor and the fake LLM
+# backend, seeds a synthetic catalog shaped like static-db.json, then drives a fixed number
+# of virtual users through mixed traffic (browse, search, product, cart, wishlist, recommend,
+# checkout, orders). Reports throughput and p50/p95/p99 per endpoint as JSON, and can compare
+# a run against a saved baseline.
+#
+# The load generator shares the event loop with the app, and mongomock is far slower than
+# mongod for large scans, so numbers are only comparable with runs of the same settings on
+# the same machine. Needs the dev-only packages mongomock-motor and httpx.
+#
+#   python bench_load.py --products 500 --concurrency 16 --duration 20 --out baseline.json
+#   python bench_load.py --products 500 --concurrency 16 --duration 20 --compare baseline.json
+
+STATIC_DB = Path(__file__).resolve().parent.parent / "static-db.json"
+# Relative weight of each virtual-user action
+TRAFFIC_MIX = {
+    "browse": 30,
+    "search": 15,
+    "product": 12,
+    "cart": 15,
+    "wishlist": 8,
+    "recommend": 10,
+    "checkout": 5,
+    "orders": 5,
+}
+# Categories beyond static-db.json's own, so every outfit slot has candidates
+EXTRA_CATEGORIES = ["t-shirt", "jeans", "chinos", "blazer", "jacket", "sneakers", "kurta", "boots"]
+ADJECTIVES = ["Relaxed", "Slim", "Classic", "Tailored", "Minimal", "Vintage", "Cropped", "Oversized", "Linen", "Wool"]
+COLORS = ["Black", "White", "Navy", "Beige", "Olive", "Grey", "Blue", "Maroon"]
+OCCASIONS = ["Casual", "Work", "Party", "Wedding", "Festive"]
+GENDERS = ["Men", "Women", "Unisex"]
+SORTS = [None, "price_asc", "price_desc", "newest"]
+
+
+def configure_env(args):
+    # Module-level settings in the app read the environment at import, so this runs first
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/fashion")
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_FAKE_JITTER_MS"] = str(args.llm_jitter_ms)
+    # No change streams in mongomock, and polling would only add noise to a short run
+    os.environ.setdefault("CATALOG_SYNC", "off")
+    os.environ.setdefault("METRICS_TRACE", "0")
+
+
+# --- Synthetic data ---
+
+def synthetic_seed(products: int, rng: random.Random) -> dict:
+    static = json.loads(STATIC_DB.read_text())
+    templates = static["products"]
+    categories = sorted({p["category"] for p in templates}) + EXTRA_CATEGORIES
+    docs = []
+    for i in range(products):
+        template = rng.choice(templates)
+        category = rng.choice(categories)
+        docs.append({
+            **{k: v for k, v in template.items() if k != "_id"},
+            "name": f"{rng.choice(ADJECTIVES)} {template['name']} {i}",
+            "category": category,
+            "price": round(template["price"] * rng.uniform(0.5, 1.5), 2),
+            "colors": rng.sample(COLORS, 2),
+            "tags": rng.sample(sorted({t for p in templates for t in p.get("tags", [])}), 2),
+            "imageUrl": f"{template['imageUrl']}?v={i}",
+            # Enough that checkouts never run out during a run
+            "stock": 10 ** 6,
+        })
+    collections = [{k: v for k, v in c.items() if k not in ("_id", "productIds")} for c in static["collections"]]
+    return {"products": docs, "collections": collections, "users": []}
+
+
+def search_terms(products: List[dict]) -> List[str]:
+    words = sorted({w.lower() for p in products for w in p["name"].split() if len(w) > 3 and not w.isdigit()})
+    return words or ["shirt"]
+
+
+# --- Traffic ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.recording = False
+
+    async def request(self, client, method: str, label_path: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            label = f"{method} {label_path}"
+            self.latencies.setdefault(label, []).append(elapsed)
+            if response.status_code >= 400:
+                by_status = self.errors.setdefault(label, {})
+                by_status[str(response.status_code)] = by_status.get(str(response.status_code), 0) + 1
+        return response
+
+
+class VirtualUser:
+    def __init__(self, index: int, client, recorder: Recorder, catalog: List[dict], categories: List[str],
+                 terms: List[str], seed: int):
+        self.user_id = f"loadtest-user-{index}"
+        self.client = client
+        self.recorder = recorder
+        self.catalog = catalog
+        self.categories = categories
+        self.terms = terms
+        self.rng = random.Random(seed * 1000 + index)
+        self.cart: Dict[str, int] = {}
+
+    def request(self, method: str, label_path: str, url: str, **kwargs):
+        return self.recorder.request(self.client, method, label_path, url, **kwargs)
+
+    def product(self) -> dict:
+        return self.rng.choice(self.catalog)
+
+    async def browse(self):
+        category = self.rng.choice(self.categories)
+        sort = self.rng.choice(SORTS)
+        if self.rng.random() < 0.5:
+            params = {"category": category, **({"sort": sort} if sort else {})}
+            await self.request("GET", "/products", "/products", params=params)
+        else:
+            params = {"category": category, "limit": 24, "view": "card", **({"sort": sort} if sort else {})}
+            await self.request("GET", "/products/page", "/products/page", params=params)
+        if self.rng.random() < 0.3:
+            await self.request("GET", "/collections", "/collections")
+
+    async def search(self):
+        term = self.rng.choice(self.terms)
+        await self.request("GET", "/products/suggest", "/products/suggest", params={"q": term[:3]})
+        await self.request("GET", "/products", "/products", params={"search": term})
+
+    async def view_product(self):
+        await self.request("GET", "/products/{id}", f"/products/{self.product()['_id']}")
+
+    async def cart_flow(self):
+        product = self.product()
+        item = {"productId": product["_id"], "quantity": self.rng.randint(1, 2)}
+        await self.request("POST", "/cart/{userId}/add", f"/cart/{self.user_id}/add", json=item)
+        self.cart[product["_id"]] = self.cart.get(product["_id"], 0) + item["quantity"]
+        await self.request("GET", "/cart/{userId}", f"/cart/{self.user_id}")
+
+    async def wishlist_flow(self):
+        product = self.product()
+        await self.request("POST", "/wishlist/{userId}/add", f"/wishlist/{self.user_id}/add", json={"productId": product["_id"]})
+        await self.request("GET", "/wishlist/{userId}", f"/wishlist/{self.user_id}")
+
+    async def recommend(self):
+        await self.request("POST", "/recommend", "/recommend", json={
+            "product": self.product(),
+            "occasion": self.rng.choice(OCCASIONS),
+            "gender": self.rng.choice(GENDERS),
+        })
+
+    async def checkout(self):
+        if not self.cart:
+            await self.cart_flow()
+        prices = {p["_id"]: p["price"] for p in self.catalog}
+        items = [{"productId": pid, "quantity": qty} for pid, qty in self.cart.items()]
+        total = round(sum(prices[pid] * qty for pid, qty in self.cart.items()), 2)
+        address = {"fullName": "Load Test", "addressLine1": "1 Main St", "city": "Pune", "state": "MH",
+                   "postalCode": "411001", "country": "IN"}
+        response = await self.request(
+            "POST", "/checkout", "/checkout",
+            json={"userId": self.user_id, "items": items, "total": total, "shippingAddress": address},
+            headers={"Idempotency-Key": str(uuid.UUID(int=self.rng.getrandbits(128)))}
+        )
+        if response.status_code == 200:
+            self.cart = {}
+
+    async def orders(self):
+        await self.request("GET", "/orders/user/{userId}/summary", f"/orders/user/{self.user_id}/summary")
+
+    async def step(self):
+        action = self.rng.choices(list(TRAFFIC_MIX), weights=list(TRAFFIC_MIX.values()))[0]
+        await {
+            "browse": self.browse,
+            "search": self.search,
+            "product": self.view_product,
+            "cart": self.cart_flow,
+            "wishlist": self.wishlist_flow,
+            "recommend": self.recommend,
+            "checkout": self.checkout,
+            "orders": self.orders,
+        }[action]()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # Nearest-rank
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder: Recorder, seconds: float) -> dict:
+    endpoints = {}
+    for label, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        endpoints[label] = {
+            "count": len(values),
+            "errors": recorder.errors.get(label, {}),
+            "rps": round(len(values) / seconds, 2),
+            "p50Ms": round(percentile(values, 50) * 1000, 2),
+            "p95Ms": round(percentile(values, 95) * 1000, 2),
+            "p99Ms": round(percentile(values, 99) * 1000, 2),
+            "maxMs": round(values[-1] * 1000, 2),
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    errors = sum(sum(e["errors"].values()) for e in endpoints.values())
+    return {"requests": total, "errors": errors, "seconds": round(seconds, 2), "rps": round(total / seconds, 2), "endpoints": endpoints}
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for label, current in report["endpoints"].items():
+        previous = baseline["endpoints"].get(label)
+        if not previous:
+            continue
+        for key in ("p95Ms", "p99Ms"):
+            if current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{label} {key}: {previous[key]:.2f} -> {current[key]:.2f}")
+    if report["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['rps']:.1f} -> {report['rps']:.1f} req/s")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+    import mongomock_motor
+
+    from pymongo.uri_parser import parse_uri
+
+    class MockClient(mongomock_motor.AsyncMongoMockClient):
+        # mongomock-motor's get_default_database returns the unwrapped (synchronous) database
+        def get_default_database(self, *args, **kwargs):
+            return self.get_database(parse_uri(os.environ["MONGODB_URI"])["database"])
+
+    import database
+    database.use_client(MockClient(os.environ["MONGODB_URI"]))
+    import main
+    from seed_import import SeedImporter, records_from_seed
+
+    rng = random.Random(args.seed)
+    seed = synthetic_seed(args.products, rng)
+    importer = SeedImporter(main.SEED_COLLECTIONS)
+    await importer.import_records(records_from_seed(seed))
+    await main.startup()
+
+    catalog = [
+        {**p, "_id": str(p["_id"]), "createdAt": p["createdAt"].isoformat()}
+        for p in await main.product_collection.find({}).to_list(None)
+    ]
+    categories = sorted({p["category"] for p in catalog})
+    terms = search_terms(catalog)
+
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+        users = [VirtualUser(i, client, recorder, catalog, categories, terms, args.seed) for i in range(args.concurrency)]
+
+        async def drive(user: VirtualUser, deadline: float):
+            while time.perf_counter() < deadline:
+                await user.step()
+
+        # Warm-up (caches, catalog pools, code paths) is not recorded
+        await asyncio.gather(*(drive(u, time.perf_counter() + args.warmup) for u in users))
+        recorder.recording = True
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(u, start + args.duration) for u in users))
+        elapsed = time.perf_counter() - start
+
+    report = summarize(recorder, elapsed)
+    report["config"] = {
+        "products": args.products,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "llmLatencyMs": args.llm_latency_ms,
+        "llmJitterMs": args.llm_jitter_ms,
+        "seed": args.seed,
+        "mix": TRAFFIC_MIX,
+        "python": platform.python_version(),
+    }
+    report["app"] = {
+        "recommend": {"cache": main.recommendation_cache.stats(), "llm": main.llm_gateway.stats()},
+        "checkout": main.checkout_engine.stats(),
+        "products": main.product_cache.stats(),
+    }
+    await main.shutdown()
+    return report
+
+
+def main(args):
+    configure_env(args)
+    report = asyncio.run(run(args))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['requests']} requests in {report['seconds']}s: {report['rps']} req/s, {report['errors']} errors")
+        print(f"{'endpoint':<36} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9}  errors")
+        for label, e in report["endpoints"].items():
+            print(f"{label:<36} {e['count']:>7} {e['p50Ms']:>7.2f}ms {e['p95Ms']:>7.2f}ms {e['p99Ms']:>7.2f}ms  {e['errors'] or ''}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write the JSON report here (e.g. a baseline)")
+    parser.add_argument("--compare", help="baseline JSON to compare p95/p99 and throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import time
+
+from passwords import PasswordHasher, check_password, hash_password
+
+# Login storm: N concurrent password checks, run inline on the event loop (the old
+# behaviour) and through the password pool. Loop lag shows how long every other request
+# on the worker would have been stalled.
+#
+#   python bench_login_storm.py --logins 64 --rounds 10 --pool-size 4
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list):
+    interval = 0.005
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def storm(label: str, login, logins: int):
+    stop = asyncio.Event()
+    lag_samples = [0.0]
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lag_samples))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await lag_task
+    rejected = sum(1 for r in results if isinstance(r, Exception))
+    print(f"{label:<8} {elapsed:7.2f}s  {(logins - rejected) / elapsed:8.1f} logins/sec  "
+          f"max loop lag {max(lag_samples) * 1000:8.1f}ms  rejected {rejected}")
+
+
+async def run(args):
+    hashed = hash_password("correct horse battery staple", args.rounds)
+
+    async def inline_login():
+        return check_password("correct horse battery staple", hashed)
+
+    hasher = PasswordHasher(size=args.pool_size, max_pending=args.max_pending, rounds=args.rounds)
+
+    async def pooled_login():
+        return await hasher.verify("correct horse battery staple", hashed)
+
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, pool size {args.pool_size}")
+    await storm("inline", inline_login, args.logins)
+    await storm("pool", pooled_login, args.logins)
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=1024)
+    asyncio.run(run(parser.parse_args()))
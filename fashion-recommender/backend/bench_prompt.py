@@ -0,0 +1,83 @@
+import json
+import random
+import argparse
+
+from catalog import ProductRecord
+from prompts import PROMPT_TOKEN_BUDGET, build_stylist_prompt, estimate_tokens
+
+# Stylist prompt size: the old inline prompt (json.dumps of every candidate in an indented
+# f-string) against prompts.build_stylist_prompt, for a range of candidate counts. Tokens are
+# the same chars/4 estimate the builder budgets with.
+#
+#   python bench_prompt.py --counts 12,24,40 --budget 800
+
+CATEGORIES = ["Shirts", "T-Shirt", "Jeans", "Chinos", "Blazer", "Jacket", "Sneakers", "Loafers", "Belts", "Watches"]
+COLORS = ["Black", "White", "Navy", "Beige", "Olive", "Grey", "Brown"]
+
+MAIN_PRODUCT = {
+    "name": "Oxford Button-Down Shirt", "category": "Shirts", "colors": ["White"],
+    "description": "A crisp cotton oxford with a button-down collar and a relaxed, easy fit.",
+}
+
+
+def synthetic_candidates(count: int):
+    return [
+        ProductRecord(
+            id=f"{random.getrandbits(96):024x}", name=f"{random.choice(COLORS)} {random.choice(CATEGORIES)} {i}",
+            category=random.choice(CATEGORIES), color=random.choice(COLORS),
+            price=round(random.uniform(10, 400), 2), image=f"https://images.example.com/{i}.jpg"
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_prompt(product: dict, candidates, occasion: str, gender: str) -> str:
+    # What build_recommendation sent before the prompt builder
+    candidate_list_str = json.dumps([
+        {"id": c.id, "name": c.name, "category": c.category, "color": c.color, "price": c.price}
+        for c in candidates
+    ])
+    main_product_str = json.dumps({
+        "name": product.get("name"),
+        "category": product.get("category"),
+        "color": product.get("colors", ["Unknown"])[0] if product.get("colors") else "Unknown",
+        "description": product.get("description", "")
+    })
+    return f"""
+        You are a professional fashion stylist.
+        I have a main product: {main_product_str}
+
+        I have a list of candidate products:
+        {candidate_list_str}
+
+        Please select 3-4 items from the candidate list that form a complete, stylish outfit with the main product for a '{occasion}' occasion for {gender}.
+        The outfit must be color-coordinated and appropriate for the occasion.
+
+        Return ONLY a valid JSON object with this structure:
+        {{
+            "selected_ids": ["id1", "id2", "id3"],
+            "style_tips": ["Tip 1", "Tip 2", "Tip 3"]
+        }}
+        Do not include any markdown formatting or explanations outside the JSON.
+        """
+
+
+def main(args):
+    random.seed(7)
+    for count in [int(c) for c in args.counts.split(",")]:
+        candidates = synthetic_candidates(count)
+        legacy = estimate_tokens(legacy_prompt(MAIN_PRODUCT, candidates, "Office", "Men"))
+        unbounded = build_stylist_prompt(MAIN_PRODUCT, candidates, "Office", "Men", budget=10 ** 9)
+        budgeted = build_stylist_prompt(MAIN_PRODUCT, candidates, "Office", "Men", budget=args.budget)
+        print(
+            f"{count:>4} candidates  legacy {legacy:6d} tok  compact {unbounded.tokens:6d} tok "
+            f"({legacy / unbounded.tokens:4.1f}x)  budget {args.budget}: {budgeted.tokens:6d} tok, "
+            f"{budgeted.candidates} kept / {budgeted.dropped} dropped"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", default="12,24,40")
+    parser.add_argument("--budget", type=int, default=PROMPT_TOKEN_BUDGET)
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+import re
+import time
+import random
+import argparse
+
+from bson import ObjectId
+
+from search_index import SearchIndex
+
+# Product search: unanchored case-insensitive regex over every name (what GET /products did,
+# minus Mongo's own per-document overhead, so the regex numbers are a lower bound) against the
+# in-memory inverted index.
+#
+#   python bench_search.py --sizes 10000,100000,1000000
+
+ADJECTIVES = ["Relaxed", "Slim", "Classic", "Tailored", "Minimal", "Vintage", "Cropped", "Oversized", "Linen", "Wool"]
+NOUNS = ["Oxford Shirt", "Poplin Shirt", "Chinos", "Jeans", "Bomber Jacket", "Blazer", "Kurta", "Sherwani", "Joggers", "Tee"]
+BRANDS = ["ARKET", "COS", "LEVI'S", "UNIQLO", "ZARA", "H&M", "MANGO", "FABINDIA"]
+TAGS = ["casual", "formal", "party", "wedding", "festive", "work", "summer", "winter", "streetwear"]
+QUERIES = ["shirt", "oxford sh", "slim jeans", "bla", "wool blazer", "festive kurta", "levi"]
+
+
+def synthetic_docs(count: int):
+    for i in range(count):
+        yield {
+            "_id": ObjectId(),
+            "name": f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {i}",
+            "brand": random.choice(BRANDS),
+            "tags": random.sample(TAGS, 2),
+            "description": f"A {random.choice(ADJECTIVES).lower()} piece for {random.choice(TAGS)} days."
+        }
+
+
+def time_per_query(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(QUERIES)) * 1000
+
+
+def run(size: int, repeat: int):
+    docs = list(synthetic_docs(size))
+    names = [d["name"] for d in docs]
+
+    start = time.perf_counter()
+    index = SearchIndex(docs)
+    build_seconds = time.perf_counter() - start
+
+    def regex_scan(q):
+        pattern = re.compile(re.escape(q), re.IGNORECASE)
+        return [n for n in names if pattern.search(n)]
+
+    regex_ms = time_per_query(regex_scan, max(1, repeat // 10))
+    index_ms = time_per_query(lambda q: index.search(q, 1000), repeat)
+    print(f"{size:>9} products  build {build_seconds:6.2f}s  regex {regex_ms:9.2f}ms/query  "
+          f"index {index_ms:8.3f}ms/query  speedup {regex_ms / index_ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes.split(","):
+        run(int(size), args.repeat)
@@ -0,0 +1,144 @@
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi import FastAPI
+
+from fast_json import orjson, trusted_response
+from models import OrderModel, ProductModel
+
+# Per-request CPU time of a large list response: response_model validation + the default JSON
+# encoder (what the endpoints do by default) against FAST_RESPONSES (trusted projection +
+# orjson). Requests go straight through the ASGI app in-process (no Mongo, sockets or HTTP
+# client), and the response bodies of both paths are checked to decode to the same JSON.
+#
+#   python bench_serialization.py --sizes 100,1000 --requests 20
+
+CATEGORIES = ["Shirts", "T-Shirt", "Jeans", "Chinos", "Blazer", "Jacket", "Sneakers", "Kurta"]
+COLORS = ["Black", "White", "Navy", "Beige", "Olive"]
+
+
+def synthetic_products(count: int) -> List[dict]:
+    now = datetime.now().replace(microsecond=0)
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Product {i}",
+            "description": "A relaxed piece in soft cotton with a clean finish.",
+            "price": round(random.uniform(10, 400), 2),
+            "category": random.choice(CATEGORIES),
+            "brand": "ARKET",
+            "imageUrl": f"https://images.example.com/products/{i:08d}.jpg",
+            "images": [f"https://images.example.com/products/{i:08d}-{n}.jpg" for n in range(3)],
+            "colors": [random.choice(COLORS)],
+            "tags": ["casual", "summer"],
+            "stock": random.randint(0, 50),
+            "createdAt": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_orders(count: int) -> List[dict]:
+    now = datetime.now().replace(microsecond=0)
+    address = {"fullName": "A B", "addressLine1": "1 Main St", "city": "Pune", "state": "MH", "postalCode": "411001", "country": "IN"}
+    return [
+        {
+            "_id": ObjectId(),
+            "userId": "u1",
+            "orderId": f"#ORD-{i}",
+            "items": [
+                {"productId": str(ObjectId()), "name": f"Item {n}", "price": 49.0, "image": "x", "quantity": 1}
+                for n in range(4)
+            ],
+            "total": 196.0,
+            "shippingAddress": address,
+            "status": "Processing",
+            "paymentMethod": "Credit Card (Mock)",
+            "createdAt": now - timedelta(hours=i),
+            "updatedAt": now - timedelta(hours=i),
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(products: List[dict], orders: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/validated/products", response_model=List[ProductModel])
+    async def validated_products():
+        return products
+
+    @app.get("/fast/products", response_model=List[ProductModel])
+    async def fast_products():
+        return trusted_response(products, ProductModel)
+
+    @app.get("/validated/orders", response_model=List[OrderModel])
+    async def validated_orders():
+        return orders
+
+    @app.get("/fast/orders", response_model=List[OrderModel])
+    async def fast_orders():
+        return trusted_response(orders, OrderModel)
+
+    return app
+
+
+async def call(app: FastAPI, path: str) -> bytes:
+    # One GET straight through the ASGI app, so client-side parsing isn't part of the timing
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def cpu_per_request(app: FastAPI, path: str, requests: int, rounds: int = 5) -> float:
+    # Best of several rounds, to keep scheduler noise out of the comparison
+    await call(app, path)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.process_time()
+        for _ in range(requests):
+            await call(app, path)
+        best = min(best, (time.process_time() - start) / requests * 1000)
+    return best
+
+
+async def main(args):
+    print(f"Encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        app = build_app(synthetic_products(size), synthetic_orders(size))
+        for resource in ("products", "orders"):
+            validated = json.loads(await call(app, f"/validated/{resource}"))
+            fast = json.loads(await call(app, f"/fast/{resource}"))
+            same = json.dumps(validated, sort_keys=True) == json.dumps(fast, sort_keys=True)
+            slow_ms = await cpu_per_request(app, f"/validated/{resource}", args.requests)
+            fast_ms = await cpu_per_request(app, f"/fast/{resource}", args.requests)
+            print(
+                f"{size:>6} {resource:<9} validated {slow_ms:8.2f}ms  fast {fast_ms:8.2f}ms  "
+                f"speedup {slow_ms / fast_ms:5.1f}x  same body: {same}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000")
+    parser.add_argument("--requests", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+
+import motor.motor_asyncio
+
+from session_store import build_session_stores
+
+# Mongo operations per shopping session, direct stores vs the write-behind session tier.
+# Each session is a burst of cart/wishlist clicks (think time compressed to --think-ms);
+# the write-behind tier flushes every --flush-seconds.
+#
+#   python bench_session_store.py --sessions 50 --clicks 40 --uri mongodb://localhost:27017
+
+WRITE_METHODS = {"find_one_and_update", "update_one", "insert_one", "replace_one", "bulk_write"}
+READ_METHODS = {"find_one", "find"}
+
+
+class CountingCollection:
+    # Counts the operations the stores issue; everything is passed through untouched
+    def __init__(self, inner):
+        self.inner = inner
+        self.reads = 0
+        self.writes = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name in WRITE_METHODS:
+            async def write(*args, **kwargs):
+                self.writes += 1
+                return await attr(*args, **kwargs)
+            return write
+        if name in READ_METHODS:
+            def read(*args, **kwargs):
+                self.reads += 1
+                return attr(*args, **kwargs)
+            return read
+        return attr
+
+
+async def session(carts, wishlists, user_id: str, clicks: int, think: float):
+    await carts.get(user_id)
+    await wishlists.get(user_id)
+    for _ in range(clicks):
+        action = random.random()
+        product_id = f"p{random.randint(1, 20)}"
+        if action < 0.4:
+            await carts.add(user_id, {"productId": product_id, "quantity": 1})
+        elif action < 0.55:
+            await carts.update(user_id, {"productId": product_id, "quantity": random.randint(0, 3)})
+        elif action < 0.7:
+            await wishlists.add(user_id, product_id)
+        elif action < 0.8:
+            await wishlists.remove(user_id, product_id)
+        elif action < 0.9:
+            await carts.get(user_id)
+        else:
+            await wishlists.get(user_id)
+        await asyncio.sleep(think)
+
+
+async def run(label: str, mode: str, db, args):
+    cart_collection = CountingCollection(db["carts"])
+    wishlist_collection = CountingCollection(db["wishlists"])
+    await db["carts"].delete_many({})
+    await db["wishlists"].delete_many({})
+    carts, wishlists, tiers = build_session_stores(cart_collection, wishlist_collection, mode)
+    for tier in tiers:
+        tier.flush_seconds = args.flush_seconds
+        tier.start()
+
+    random.seed(7)
+    start = time.perf_counter()
+    await asyncio.gather(*(session(carts, wishlists, f"user-{i}", args.clicks, args.think_ms / 1000)
+                           for i in range(args.sessions)))
+    for tier in tiers:
+        await tier.stop()
+    elapsed = time.perf_counter() - start
+
+    writes = cart_collection.writes + wishlist_collection.writes
+    reads = cart_collection.reads + wishlist_collection.reads
+    # Direct stores write one document per write; a flush writes every dirty document
+    documents = sum(t.documents_written for t in tiers) if tiers else writes
+    print(f"{label:<13} {elapsed:6.2f}s  writes/session {writes / args.sessions:7.2f}  "
+          f"documents written/session {documents / args.sessions:7.2f}  reads/session {reads / args.sessions:7.2f}")
+    return documents
+
+
+async def main(args):
+    db = motor.motor_asyncio.AsyncIOMotorClient(args.uri)["fashion_bench"]
+
+    print(f"{args.sessions} sessions x {args.clicks} clicks, {args.think_ms}ms apart, flush every {args.flush_seconds}s")
+    direct = await run("direct", "", db, args)
+    buffered = await run("write-behind", "memory", db, args)
+    print(f"write reduction {direct / max(1, buffered):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--clicks", type=int, default=40)
+    parser.add_argument("--think-ms", type=float, default=50)
+    parser.add_argument("--flush-seconds", type=float, default=1.0)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    asyncio.run(main(parser.parse_args()))
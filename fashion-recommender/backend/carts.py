@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Upserts race each other only on the very first write for a user; the unique index on
+# carts.userId turns the loser into a DuplicateKeyError and we simply retry
+UPSERT_RETRIES = 3
+
+
+class CartNotFound(LookupError):
+    pass
+
+
+class CartStore:
+    # Every mutation is a single atomic update on the cart document (no read-modify-write),
+    # returning the updated cart, so concurrent adds from several tabs never lose quantities.
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id: str) -> dict:
+        cart = await self.collection.find_one({"userId": user_id})
+        if cart:
+            return cart
+        return await self._upsert(
+            {"userId": user_id},
+            {"$setOnInsert": {"items": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}}
+        )
+
+    async def add(self, user_id: str, item: dict) -> dict:
+        now = datetime.now()
+        for _ in range(UPSERT_RETRIES):
+            # Already in the cart: bump the quantity in place
+            cart = await self.collection.find_one_and_update(
+                {"userId": user_id, "items.productId": item["productId"]},
+                {"$inc": {"items.$.quantity": item["quantity"]}, "$set": {"updatedAt": now}},
+                return_document=ReturnDocument.AFTER
+            )
+            if cart:
+                return cart
+            # Not in the cart (or no cart yet): append, creating the cart on the first add.
+            # The $ne guard keeps a concurrent add of the same product from pushing it twice.
+            try:
+                return await self.collection.find_one_and_update(
+                    {"userId": user_id, "items.productId": {"$ne": item["productId"]}},
+                    {"$push": {"items": item}, "$set": {"updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # The cart exists and the product landed in it meanwhile: go back to $inc
+                continue
+        raise RuntimeError(f"Cart update for {user_id} kept conflicting")
+
+    async def update(self, user_id: str, item: dict) -> dict:
+        now = datetime.now()
+        if item["quantity"] > 0:
+            fields = {"items.$.quantity": item["quantity"], "updatedAt": now}
+            for key in ("size", "color"):
+                if item.get(key):
+                    fields[f"items.$.{key}"] = item[key]
+            cart = await self.collection.find_one_and_update(
+                {"userId": user_id, "items.productId": item["productId"]},
+                {"$set": fields},
+                return_document=ReturnDocument.AFTER
+            )
+            if cart:
+                return cart
+            # Product isn't in the cart: nothing to change
+            cart = await self.collection.find_one({"userId": user_id})
+        else:
+            cart = await self.collection.find_one_and_update(
+                {"userId": user_id},
+                {"$pull": {"items": {"productId": item["productId"]}}, "$set": {"updatedAt": now}},
+                return_document=ReturnDocument.AFTER
+            )
+        if not cart:
+            raise CartNotFound(user_id)
+        return cart
+
+    async def clear(self, user_id: str, session=None):
+        await self.collection.update_one({"userId": user_id}, {"$set": {"items": [], "updatedAt": datetime.now()}}, session=session)
+
+    async def _upsert(self, query: dict, update: dict) -> dict:
+        try:
+            return await self.collection.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            return await self.collection.find_one(query)
@@ -0,0 +1,324 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from search_index import SearchIndex
+from taxonomy import CategoryTaxonomy
+
+# ranking (numpy) is imported when the first snapshot is built, not when the app is imported
+if TYPE_CHECKING:
+    from ranking import FeatureEncoder
+
+logger = logging.getLogger(__name__)
+
+# "auto" tries a change stream and falls back to polling the version stamp (standalone Mongo)
+CATALOG_SYNC = os.getenv("CATALOG_SYNC", "auto")
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "30"))
+
+CATALOG_META_ID = "products"
+# Record fields plus what the ranking encoder and search index read; the text fields are
+# dropped once encoded/indexed
+SNAPSHOT_PROJECTION = {"name": 1, "category": 1, "colors": 1, "price": 1, "imageUrl": 1, "tags": 1, "style": 1, "description": 1, "brand": 1}
+
+
+def _touches_snapshot(update_description: dict) -> bool:
+    fields = list(update_description.get("updatedFields") or {}) + list(update_description.get("removedFields") or [])
+    if not fields or update_description.get("truncatedArrays"):
+        return True
+    return any(f.split(".")[0] in SNAPSHOT_PROJECTION for f in fields)
+
+
+class ProductRecord(NamedTuple):
+    id: str
+    name: str
+    category: str
+    color: str
+    price: float
+    image: str
+
+
+def _price(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def record_from_doc(doc: dict) -> ProductRecord:
+    colors = doc.get("colors")
+    return ProductRecord(
+        id=str(doc["_id"]),
+        name=doc.get("name", ""),
+        # Categories and colors repeat across the catalog; interning keeps one copy of each
+        category=sys.intern(doc.get("category") or ""),
+        color=sys.intern(colors[0] if colors else "Unknown"),
+        price=_price(doc.get("price")),
+        image=doc.get("imageUrl", "")
+    )
+
+
+async def bump_catalog_version(meta_collection):
+    # Catalog writers call this so every worker's snapshot reloads
+    await meta_collection.update_one(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"version": 1}, "$set": {"updatedAt": datetime.now()}},
+        upsert=True
+    )
+
+
+class CatalogSnapshot:
+    # Compact per-product records grouped by category (and so by outfit slot), plus
+    # one embedding row per product for local ranking and the product search index
+    def __init__(self, docs: List[dict] = (), version: int = 0, encoder: Optional["FeatureEncoder"] = None):
+        from ranking import FeatureEncoder, VectorIndex
+        self.version = version
+        self.loaded_at = datetime.now()
+        self.encoder = encoder or FeatureEncoder()
+        self.vectors = VectorIndex(self.encoder.dim, capacity=max(1024, len(docs)))
+        self.by_id: Dict[str, ProductRecord] = {}
+        self._by_category: Dict[str, Dict[str, ProductRecord]] = defaultdict(dict)
+        for doc in docs:
+            record = record_from_doc(doc)
+            self.by_id[record.id] = record
+            self._by_category[record.category][record.id] = record
+        if docs:
+            self.vectors.load([str(d["_id"]) for d in docs], self.encoder.encode_many(docs))
+        self.search = SearchIndex(docs)
+        self._rebuild_taxonomy()
+
+    def _rebuild_taxonomy(self):
+        self.taxonomy = CategoryTaxonomy(self._by_category.keys())
+        self._invalidate_pools()
+
+    def _invalidate_pools(self):
+        self._candidates: Dict[str, List[ProductRecord]] = {}
+        self._candidate_matrices = {}
+
+    def upsert(self, doc: dict):
+        record = record_from_doc(doc)
+        previous = self.by_id.get(record.id)
+        if previous is not None:
+            self._remove_from_category(previous)
+        new_category = record.category not in self._by_category
+        self.by_id[record.id] = record
+        self._by_category[record.category][record.id] = record
+        self.vectors.set(record.id, self.encoder.encode(doc))
+        self.search.add(doc)
+        if new_category or (previous is not None and previous.category not in self._by_category):
+            self._rebuild_taxonomy()
+        else:
+            self._invalidate_pools()
+
+    def remove(self, product_id: str):
+        previous = self.by_id.pop(product_id, None)
+        if previous is None:
+            return
+        self._remove_from_category(previous)
+        self.vectors.remove(product_id)
+        self.search.remove(product_id)
+        if previous.category not in self._by_category:
+            self._rebuild_taxonomy()
+        else:
+            self._invalidate_pools()
+
+    def _remove_from_category(self, record: ProductRecord):
+        bucket = self._by_category.get(record.category)
+        if bucket is not None:
+            bucket.pop(record.id, None)
+            if not bucket:
+                del self._by_category[record.category]
+
+    def search_ids(self, query: str, limit: int, category: Optional[str] = None) -> List[str]:
+        # Category-restricted searches filter inside the index, before the limit applies
+        within = self._by_category.get(category, {}) if category else None
+        return self.search.search(query, limit, within)
+
+    def records_for_categories(self, categories: List[str]) -> List[ProductRecord]:
+        records = []
+        for category in categories:
+            records.extend(self._by_category.get(category, {}).values())
+        return records
+
+    def slot_records(self, slot: str) -> List[ProductRecord]:
+        return self.records_for_categories(self.taxonomy.categories_by_slot.get(slot, []))
+
+    def candidates(self, hero_slot: str) -> List[ProductRecord]:
+        # Complementary pool for a hero slot, memoized until the snapshot changes
+        pool = self._candidates.get(hero_slot)
+        if pool is None:
+            pool = self.records_for_categories(self.taxonomy.complementary_categories(hero_slot))
+            self._candidates[hero_slot] = pool
+        return pool
+
+    def rank_candidates(self, hero_slot: str, hero: dict, occasion: str, gender: str, limit: int) -> List[ProductRecord]:
+        # Vectorized cosine/compatibility ranking of the complementary pool
+        from ranking import score, top_k
+        pool = self.candidates(hero_slot)
+        if not pool:
+            return []
+        matrix = self._candidate_matrices.get(hero_slot)
+        if matrix is None:
+            matrix = self.vectors.gather([r.id for r in pool])
+            self._candidate_matrices[hero_slot] = matrix
+        scores = score(matrix, self.encoder.encode(hero), self.encoder.encode_context(occasion, gender))
+        return [pool[i] for i in top_k(scores, limit)]
+
+    def assemble_outfit(self, ranked: List[ProductRecord], size: int = 3) -> List[ProductRecord]:
+        from ranking import assemble_outfit
+        return assemble_outfit(ranked, self.taxonomy.slot_of, size)
+
+    def fallback(self, hero_slot: str) -> List[ProductRecord]:
+        categories, limit = self.taxonomy.fallback_categories(hero_slot)
+        return self.records_for_categories(categories)[:limit]
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+class CatalogStore:
+    def __init__(self, collection, meta_collection, sync_mode: str = CATALOG_SYNC, poll_seconds: float = CATALOG_POLL_SECONDS):
+        self.collection = collection
+        self.meta_collection = meta_collection
+        self.sync_mode = sync_mode
+        self.poll_seconds = poll_seconds
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.active_sync: Optional[str] = None
+        self.reloads = 0
+        self.incremental_updates = 0
+        self._listeners: List[Callable[[], Awaitable[None]]] = []
+        self._load_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self._sync_on_load = False
+
+    def on_change(self, listener: Callable[[], Awaitable[None]]):
+        self._listeners.append(listener)
+
+    async def _notify(self):
+        for listener in self._listeners:
+            try:
+                await listener()
+            except Exception as e:
+                logger.error(f"Catalog change listener failed: {e}")
+
+    async def get(self) -> CatalogSnapshot:
+        if self.snapshot is None:
+            async with self._load_lock:
+                if self.snapshot is None:
+                    await self._load()
+            if self._sync_on_load:
+                self._sync_on_load = False
+                self.start()
+        return self.snapshot
+
+    async def read_version(self) -> int:
+        meta = await self.meta_collection.find_one({"_id": CATALOG_META_ID})
+        return meta.get("version", 0) if meta else 0
+
+    async def _load(self):
+        start = time.perf_counter()
+        version = await self.read_version()
+        docs = await self.collection.find({}, SNAPSHOT_PROJECTION).to_list(None)
+        # Encoding and indexing take a while for a big catalog; keep them off the event loop
+        # and only swap the finished snapshot in
+        self.snapshot = await asyncio.to_thread(CatalogSnapshot, docs, version)
+        self.reloads += 1
+        logger.info(f"Catalog snapshot v{version}: {len(self.snapshot)} products in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    async def reload(self):
+        async with self._load_lock:
+            await self._load()
+        await self._notify()
+
+    async def bump_version(self):
+        await bump_catalog_version(self.meta_collection)
+        await self.reload()
+
+    # --- Background sync ---
+
+    def start(self, on_first_load: bool = False):
+        if self.sync_mode == "off" or self._sync_task is not None:
+            return
+        if on_first_load and self.snapshot is None:
+            # Defer the change stream / polling until something actually reads the catalog
+            self._sync_on_load = True
+            return
+        self._sync_task = asyncio.create_task(self._sync())
+
+    async def stop(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+
+    async def _sync(self):
+        if self.sync_mode in ("auto", "changestream"):
+            try:
+                await self._watch_changes()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.sync_mode == "changestream":
+                    logger.error(f"Catalog change stream failed: {e}")
+                    return
+                logger.info(f"Change streams unavailable ({e}); polling catalog version every {self.poll_seconds}s")
+        await self._poll_version()
+
+    async def _watch_changes(self):
+        async with self.collection.watch(full_document="updateLookup") as stream:
+            self.active_sync = "changestream"
+            # Anything written between the initial load and opening the stream
+            await self.reload()
+            async for change in stream:
+                await self._apply_change(change)
+
+    async def _apply_change(self, change: dict):
+        await self.get()
+        operation = change.get("operationType")
+        if operation == "update" and not _touches_snapshot(change.get("updateDescription") or {}):
+            # e.g. a checkout decrementing stock: nothing the snapshot holds has changed
+            return
+        if operation not in ("insert", "update", "replace", "delete"):
+            # drop / rename / invalidate: start over
+            await self.reload()
+            return
+        # Waits out a reload in progress, so the change lands on the snapshot being swapped in
+        async with self._load_lock:
+            snapshot = self.snapshot
+            doc = change.get("fullDocument") if operation != "delete" else None
+            if doc is None:
+                snapshot.remove(str(change["documentKey"]["_id"]))
+            else:
+                snapshot.upsert(doc)
+        self.incremental_updates += 1
+        await self._notify()
+
+    async def _poll_version(self):
+        self.active_sync = "poll"
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                version = await self.read_version()
+                if self.snapshot is None or version != self.snapshot.version:
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"Catalog version poll failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self.snapshot) if self.snapshot else 0,
+            "categories": len(self.snapshot.taxonomy) if self.snapshot else 0,
+            "version": self.snapshot.version if self.snapshot else None,
+            "loadedAt": self.snapshot.loaded_at.isoformat() if self.snapshot else None,
+            "sync": self.active_sync,
+            "reloads": self.reloads,
+            "incrementalUpdates": self.incremental_updates,
+        }
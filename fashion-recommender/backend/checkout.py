@@ -0,0 +1,268 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from order_summaries import order_summary
+
+logger = logging.getLogger(__name__)
+
+# "auto" uses a multi-document transaction when the server supports one (replica set or
+# sharded cluster) and the compensating saga on a standalone server; "on"/"off" force it
+CHECKOUT_TRANSACTIONS = os.getenv("CHECKOUT_TRANSACTIONS", "auto")
+# Client totals may differ from the server's by rounding only
+PRICE_TOLERANCE = 0.01
+
+
+class CheckoutError(Exception):
+    status_code = 400
+
+    def __init__(self, detail, status_code: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class OutOfStock(CheckoutError):
+    status_code = 409
+
+
+def order_number(order_id: ObjectId) -> str:
+    # Derived from the order's _id, so it can't collide
+    return f"#ORD-{str(order_id).upper()}"
+
+
+def request_fingerprint(order: dict) -> str:
+    # Same idempotency key with a different cart is a client bug, not a retry
+    canonical = json.dumps(
+        {
+            "items": sorted((i["productId"], i["quantity"], i.get("size"), i.get("color")) for i in order["items"]),
+            "total": round(float(order["total"]), 2),
+            "shippingAddress": order["shippingAddress"],
+        },
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CheckoutEngine:
+    # Prices and stock come from the catalog (one batched read), stock is reserved with
+    # conditional $inc updates, and the order insert + cart clear happen atomically: in a
+    # transaction where available, otherwise as a saga that releases reservations on failure.
+    def __init__(self, products, orders, carts, summaries=None, client=None, transactions: str = CHECKOUT_TRANSACTIONS,
+                 on_stock_change: Optional[Callable[[List[str]], None]] = None):
+        self.products = products
+        self.orders = orders
+        self.summaries = summaries
+        self.carts = carts
+        self.client = client
+        self.transactions = transactions
+        # Called with the product ids whose stock was reserved or released (e.g. to evict caches)
+        self.on_stock_change = on_stock_change
+        self._supports_transactions: Optional[bool] = None
+        self.placed = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.compensations = 0
+
+    async def use_transactions(self) -> bool:
+        if self.transactions != "auto":
+            return self.transactions == "on"
+        if self._supports_transactions is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+            except Exception as e:
+                logger.info(f"Could not detect transaction support, using compensating saga: {e}")
+                self._supports_transactions = False
+        return self._supports_transactions
+
+    async def checkout(self, order: dict, idempotency_key: Optional[str] = None) -> dict:
+        try:
+            return await self._checkout(order, idempotency_key)
+        except CheckoutError:
+            self.rejected += 1
+            raise
+
+    async def _checkout(self, order: dict, idempotency_key: Optional[str]) -> dict:
+        user_id = order["userId"]
+        fingerprint = request_fingerprint(order) if idempotency_key else None
+        if idempotency_key:
+            previous = await self._previous(user_id, idempotency_key, fingerprint)
+            if previous:
+                return previous
+
+        doc = await self._price(order)
+        doc["_id"] = ObjectId()
+        doc["orderId"] = order_number(doc["_id"])
+        if idempotency_key:
+            doc["idempotencyKey"] = idempotency_key
+            doc["requestHash"] = fingerprint
+
+        try:
+            if await self.use_transactions():
+                await self._place_in_transaction(doc)
+            else:
+                await self._place_with_saga(doc)
+        except DuplicateKeyError:
+            # A concurrent retry with the same key won; its order is the answer
+            if idempotency_key:
+                previous = await self._previous(user_id, idempotency_key, fingerprint)
+                if previous:
+                    return previous
+            raise
+        self.placed += 1
+        return doc
+
+    async def _previous(self, user_id: str, idempotency_key: str, fingerprint: str) -> Optional[dict]:
+        previous = await self.orders.find_one({"userId": user_id, "idempotencyKey": idempotency_key})
+        if not previous:
+            return None
+        if previous.get("requestHash") != fingerprint:
+            raise CheckoutError("Idempotency-Key was already used for a different checkout", 422)
+        self.replayed += 1
+        return previous
+
+    async def _price(self, order: dict) -> dict:
+        # Merge repeated lines for the same product/variant, then price everything server-side
+        lines: Dict[tuple, dict] = {}
+        for item in order["items"]:
+            if item["quantity"] <= 0:
+                continue
+            key = (item["productId"], item.get("size"), item.get("color"))
+            if key in lines:
+                lines[key]["quantity"] += item["quantity"]
+            else:
+                lines[key] = dict(item)
+        if not lines:
+            raise CheckoutError("Cart is empty")
+
+        ids = {line["productId"] for line in lines.values()}
+        query_ids = [ObjectId(i) if ObjectId.is_valid(i) else i for i in ids]
+        catalog = {
+            str(p["_id"]): p
+            for p in await self.products.find(
+                {"_id": {"$in": query_ids}}, {"name": 1, "price": 1, "imageUrl": 1, "stock": 1}
+            ).to_list(len(query_ids))
+        }
+        unknown = sorted(ids - set(catalog))
+        if unknown:
+            raise CheckoutError(f"Unknown products: {', '.join(unknown)}")
+
+        items, total = [], 0.0
+        for line in lines.values():
+            product = catalog[line["productId"]]
+            items.append({**line, "name": product.get("name"), "price": product["price"], "image": product.get("imageUrl")})
+            total += product["price"] * line["quantity"]
+        total = round(total, 2)
+        if abs(total - float(order["total"])) > PRICE_TOLERANCE:
+            raise CheckoutError(f"Prices have changed; the order total is now {total:.2f}", 409)
+
+        # Early, friendlier rejection; the conditional updates below are what actually guarantee stock
+        self._check_stock(items, catalog)
+
+        now = datetime.now()
+        return {
+            "userId": order["userId"],
+            "items": items,
+            "total": total,
+            "shippingAddress": order["shippingAddress"],
+            "status": "Processing",
+            "paymentMethod": "Credit Card (Mock)",
+            "createdAt": now,
+            "updatedAt": now,
+        }
+
+    def _check_stock(self, items: List[dict], catalog: Dict[str, dict]):
+        needed = self._reservations({"items": items})
+        short = [pid for pid, qty in needed.items() if "stock" in catalog[pid] and catalog[pid]["stock"] < qty]
+        if short:
+            raise OutOfStock(f"Not enough stock for: {', '.join(catalog[pid].get('name') or pid for pid in short)}")
+
+    def _reservations(self, doc: dict) -> Dict[str, int]:
+        needed: Dict[str, int] = {}
+        for item in doc["items"]:
+            needed[item["productId"]] = needed.get(item["productId"], 0) + item["quantity"]
+        return needed
+
+    async def _reserve(self, product_id: str, quantity: int, session=None) -> bool:
+        # Products without a stock field aren't stock-tracked
+        query_id = ObjectId(product_id) if ObjectId.is_valid(product_id) else product_id
+        result = await self.products.update_one(
+            {"_id": query_id, "stock": {"$gte": quantity}}, {"$inc": {"stock": -quantity}}, session=session
+        )
+        if result.modified_count:
+            return True
+        return await self.products.count_documents({"_id": query_id, "stock": {"$exists": False}}, session=session) > 0
+
+    async def _release(self, product_id: str, quantity: int):
+        query_id = ObjectId(product_id) if ObjectId.is_valid(product_id) else product_id
+        await self.products.update_one({"_id": query_id, "stock": {"$exists": True}}, {"$inc": {"stock": quantity}})
+
+    async def _place_in_transaction(self, doc: dict):
+        async def body(session):
+            for product_id, quantity in self._reservations(doc).items():
+                if not await self._reserve(product_id, quantity, session):
+                    raise OutOfStock(f"Not enough stock for product {product_id}")
+            await self.orders.insert_one(doc, session=session)
+            if self.summaries is not None:
+                await self.summaries.insert_one(order_summary(doc), session=session)
+            await self.carts.clear(doc["userId"], session=session)
+
+        async with await self.client.start_session() as session:
+            await session.with_transaction(body)
+        self._stock_changed(list(self._reservations(doc)))
+
+    async def _place_with_saga(self, doc: dict):
+        reserved = []
+        try:
+            for product_id, quantity in self._reservations(doc).items():
+                if not await self._reserve(product_id, quantity):
+                    raise OutOfStock(f"Not enough stock for product {product_id}")
+                reserved.append((product_id, quantity))
+            await self.orders.insert_one(doc)
+        except (CheckoutError, PyMongoError):
+            # Compensate: put back whatever this checkout took
+            self.compensations += bool(reserved)
+            for product_id, quantity in reserved:
+                try:
+                    await self._release(product_id, quantity)
+                except PyMongoError as e:
+                    logger.error(f"Failed to release {quantity} x {product_id} for {doc['orderId']}: {e}")
+            self._stock_changed([product_id for product_id, _ in reserved])
+            raise
+        self._stock_changed([product_id for product_id, _ in reserved])
+
+        # The order stands even if these fail; summaries can be rebuilt with order_summaries.py
+        try:
+            if self.summaries is not None:
+                await self.summaries.insert_one(order_summary(doc))
+        except PyMongoError as e:
+            logger.error(f"Order {doc['orderId']} placed but its summary was not written: {e}")
+        try:
+            await self.carts.clear(doc["userId"])
+        except PyMongoError as e:
+            logger.error(f"Order {doc['orderId']} placed but cart not cleared: {e}")
+
+    def _stock_changed(self, product_ids: List[str]):
+        if self.on_stock_change is None or not product_ids:
+            return
+        try:
+            self.on_stock_change(product_ids)
+        except Exception as e:
+            logger.error(f"Stock change callback failed for {product_ids}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "transactions": self._supports_transactions if self.transactions == "auto" else self.transactions == "on",
+            "placed": self.placed,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+            "compensations": self.compensations,
+        }
@@ -1,8 +1,15 @@
 import os
-import motor.motor_asyncio
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
 from dotenv import load_dotenv
 from pathlib import Path
 
+from db_pool import DEFAULT_MAX_POOL_SIZE, PoolMonitor, catalog_read_preference, client_options_from_env
+from metrics import METRICS_ENABLED, command_monitor
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 env_path = Path(__file__).resolve().parent.parent / '.env.local'
 load_dotenv(dotenv_path=env_path)
@@ -13,15 +20,113 @@ MONGODB_URI = os.getenv("MONGODB_URI")
 if not MONGODB_URI:
     raise ValueError("MONGODB_URI is not set in environment variables")
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
-db = client.get_default_database()
+# Pool sizes and timeouts come from MONGO_* env vars (see db_pool.py)
+client_options = client_options_from_env()
+pool_monitor = PoolMonitor(client_options.get("maxPoolSize", DEFAULT_MAX_POOL_SIZE))
+# Per-command latency and round trips per request for /metrics
+event_listeners = [pool_monitor, command_monitor] if METRICS_ENABLED else [pool_monitor]
+
+_client = None
+# Coroutines to run once, in the background, when Mongo is first used (see on_first_use)
+_first_use_hooks: List[Callable[[], Awaitable]] = []
+_first_use_tasks = set()
+
+
+def get_client():
+    # Created on first use rather than at import: importing motor and building the client
+    # (SRV/TXT lookups for mongodb+srv:// URIs) is skipped until a request needs Mongo
+    global _client
+    if _client is None:
+        import motor.motor_asyncio
+        _client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI, event_listeners=event_listeners, **client_options)
+    if _first_use_hooks:
+        _run_first_use_hooks()
+    return _client
+
+
+def on_first_use(hook: Callable[[], Awaitable]):
+    # Deferred setup (e.g. index builds under LAZY_INIT): started as a background task the
+    # first time a handle resolves inside the event loop, so it never delays that request
+    _first_use_hooks.append(hook)
+    if _client is not None:
+        _run_first_use_hooks()
+
+
+def _run_first_use_hooks():
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Resolved outside the loop (import time, scripts); retried on the next resolution
+        return
+    hooks = list(_first_use_hooks)
+    _first_use_hooks.clear()
+    for hook in hooks:
+        task = loop.create_task(hook())
+        # Strong reference until done, otherwise the task can be garbage collected mid-run
+        _first_use_tasks.add(task)
+        task.add_done_callback(_first_use_done)
+
+
+def _first_use_done(task):
+    _first_use_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Deferred database setup failed: {task.exception()}")
+
+
+def use_client(motor_client):
+    # Swap in another Motor-compatible client before first use (bench_load.py runs the app
+    # against mongomock-motor)
+    global _client
+    _client = motor_client
+
+
+class LazyHandle:
+    # Stands in for a client / database / collection and resolves it on first attribute access
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._target = None
+
+    def _get(self):
+        if self._target is None:
+            self._target = self._resolve()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __getitem__(self, name):
+        return self._get()[name]
+
+
+def lazy_collection(name: str, **options) -> LazyHandle:
+    return LazyHandle(lambda: get_client().get_default_database().get_collection(name, **options))
+
+
+client = LazyHandle(get_client)
+db = LazyHandle(lambda: get_client().get_default_database())
 
 # Collections
-product_collection = db.get_collection("products")
-cart_collection = db.get_collection("carts")
-user_collection = db.get_collection("users")
-wishlist_collection = db.get_collection("wishlists")
-order_collection = db.get_collection("orders")
-collection_collection = db.get_collection("collections")
-outfit_collection = db.get_collection("outfits")
-payment_collection = db.get_collection("paymentmethods")
+product_collection = lazy_collection("products")
+cart_collection = lazy_collection("carts")
+user_collection = lazy_collection("users")
+wishlist_collection = lazy_collection("wishlists")
+order_collection = lazy_collection("orders")
+collection_collection = lazy_collection("collections")
+outfit_collection = lazy_collection("outfits")
+payment_collection = lazy_collection("paymentmethods")
+recommendation_cache_collection = lazy_collection("recommendation_cache")
+catalog_meta_collection = lazy_collection("catalog_meta")
+precomputed_outfit_collection = lazy_collection("precomputed_outfits")
+order_summary_collection = lazy_collection("order_summaries")
+llm_memo_collection = lazy_collection("llm_memo")
+
+# Catalog browsing handles; may read from secondaries (MONGO_CATALOG_READ_PREFERENCE)
+product_read_collection = lazy_collection("products", read_preference=catalog_read_preference())
+collection_read_collection = lazy_collection("collections", read_preference=catalog_read_preference())
+
+
+def close_database():
+    # Closes every pooled connection; call once nothing else will use the client
+    # (a no-op if nothing ever did)
+    if _client is not None:
+        _client.close()
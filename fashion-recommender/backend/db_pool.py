@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import Counter
+
+from pymongo import ReadPreference
+from pymongo.monitoring import ConnectionPoolListener
+
+# Driver connection settings; unset values keep the driver default
+MONGO_POOL_SETTINGS = {
+    # Connections per server; requests beyond this wait in the queue
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "maxIdleTimeMS": ("MONGO_MAX_IDLE_MS", int),
+    # How long a request may wait for a free connection before failing fast
+    "waitQueueTimeoutMS": ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+    "socketTimeoutMS": ("MONGO_SOCKET_TIMEOUT_MS", int),
+    "appname": ("MONGO_APP_NAME", str),
+}
+DEFAULT_MAX_POOL_SIZE = 100
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+# Read preference for catalog browsing (/products, /collections). Those reads tolerate
+# replication lag; carts, orders and auth always read the primary.
+MONGO_CATALOG_READ_PREFERENCE = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "primary")
+
+
+def client_options_from_env() -> dict:
+    options = {}
+    for option, (env, cast) in MONGO_POOL_SETTINGS.items():
+        value = os.getenv(env)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+def catalog_read_preference():
+    if MONGO_CATALOG_READ_PREFERENCE not in READ_PREFERENCES:
+        raise ValueError(f"MONGO_CATALOG_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+    return READ_PREFERENCES[MONGO_CATALOG_READ_PREFERENCE]
+
+
+class PoolMonitor(ConnectionPoolListener):
+    # Connection pool utilization from driver events. Events arrive on driver threads,
+    # hence the lock.
+    def __init__(self, max_pool_size: int = DEFAULT_MAX_POOL_SIZE):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.peak_in_use = 0
+        self.peak_waiting = 0
+        self.checkouts = 0
+        self.checkout_wait_seconds = 0.0
+        self.checkout_failures = Counter()
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures[str(event.reason)] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkout_wait_seconds += getattr(event, "duration", 0.0) or 0.0
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "maxPoolSize": self.max_pool_size,
+                "open": self.open,
+                "inUse": self.in_use,
+                "waiting": self.waiting,
+                "utilization": round(self.in_use / self.max_pool_size, 3) if self.max_pool_size else 0.0,
+                "peakInUse": self.peak_in_use,
+                "peakWaiting": self.peak_waiting,
+                "checkouts": self.checkouts,
+                "avgCheckoutWaitMs": round(self.checkout_wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkoutFailures": dict(self.checkout_failures),
+                "poolClears": self.pool_clears,
+            }
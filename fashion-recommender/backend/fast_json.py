@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+from datetime import date, datetime
+from typing import Callable, Dict, List, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Off: list endpoints validate every document through their response_model (FastAPI default).
+# On: documents read from our own collections are projected to the response shape without
+# re-validation and encoded with orjson (stdlib json when orjson isn't installed).
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "0") == "1"
+
+if FAST_RESPONSES and orjson is None:
+    logger.warning("FAST_RESPONSES is on but orjson is not installed; encoding with the json module")
+
+
+def _default(value):
+    # ObjectId and anything else Mongo hands back that JSON has no type for
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _nested_model(annotation):
+    # The BaseModel inside Model / List[Model] / Optional[...], else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        model, _ = _nested_model(get_args(annotation)[0])
+        return model, model is not None
+    if origin is Union:
+        for arg in get_args(annotation):
+            if arg is not type(None):
+                return _nested_model(arg)
+    return None, False
+
+
+_projectors: Dict[type, Callable[[dict], dict]] = {}
+
+
+def projector(model: Type[BaseModel]) -> Callable[[dict], dict]:
+    # Compiles a model into a dict -> dict function producing what response_model would emit
+    # (model fields only, by alias, in field order, defaults filled in) but trusting the stored
+    # types. Per document that's a template copy, an update and dropping unknown keys, so the
+    # cost is mostly C-level dict operations rather than a Python step per field.
+    if model in _projectors:
+        return _projectors[model]
+    template, factories, renamed, nested = {}, [], [], []
+    for name, info in model.model_fields.items():
+        key = info.alias or name
+        template[key] = None if info.is_required() or info.default_factory else info.default
+        if info.default_factory:
+            factories.append((key, info.default_factory))
+        if key != name:
+            renamed.append((key, name))
+        sub, is_list = _nested_model(info.annotation)
+        if sub is not None:
+            nested.append((key, projector(sub), is_list))
+    keys = frozenset(template)
+
+    def project(doc: dict) -> dict:
+        out = template.copy()
+        out.update(doc)
+        for extra in doc.keys() - keys:
+            del out[extra]
+        for key, factory in factories:
+            if key not in doc:
+                out[key] = factory()
+        for key, name in renamed:
+            if key not in doc and name in doc:
+                out[key] = doc[name]
+        for key, sub, is_list in nested:
+            value = out[key]
+            if value is not None:
+                out[key] = [sub(v) for v in value] if is_list else sub(value)
+        return out
+
+    _projectors[model] = project
+    return project
+
+
+def trusted_response(docs, model: Type[BaseModel]) -> FastJSONResponse:
+    # Only for documents this service wrote (or seeded); there is no validation to catch bad data
+    project = projector(model)
+    if isinstance(docs, list):
+        return FastJSONResponse([project(d) for d in docs])
+    return FastJSONResponse(project(docs))
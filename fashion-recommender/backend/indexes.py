@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+from bson import SON, ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Set to 1 to explain every registered query shape at startup and log any COLLSCAN
+INDEX_DIAGNOSTICS = os.getenv("INDEX_DIAGNOSTICS", "0") == "1"
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: list
+    options: dict = {}
+
+
+# Every index the API relies on. Changing the options of an existing index makes
+# create_indexes fail (IndexOptionsConflict); drop the old one first.
+INDEXES: List[IndexSpec] = [
+    # /products filters on category and sorts on price / createdAt; /products/page adds _id as tiebreaker
+    IndexSpec("products", [("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)]),
+    IndexSpec("products", [("category", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("products", [("price", ASCENDING), ("_id", ASCENDING)]),
+    IndexSpec("products", [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("collections", [("featured", ASCENDING)]),
+    IndexSpec("users", [("email", ASCENDING)], {"unique": True}),
+    IndexSpec("carts", [("userId", ASCENDING)], {"unique": True}),
+    IndexSpec("wishlists", [("userId", ASCENDING)], {"unique": True}),
+    IndexSpec("orders", [("userId", ASCENDING), ("createdAt", DESCENDING)]),
+    IndexSpec("orders", [("orderId", ASCENDING)]),
+    # Checkout idempotency: one order per (user, Idempotency-Key)
+    IndexSpec("orders", [("userId", ASCENDING), ("idempotencyKey", ASCENDING)],
+              {"unique": True, "partialFilterExpression": {"idempotencyKey": {"$exists": True}}}),
+    IndexSpec("order_summaries", [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("outfits", [("userId", ASCENDING), ("createdAt", DESCENDING)]),
+    IndexSpec("paymentmethods", [("userId", ASCENDING)]),
+    # Shared recommendation cache entries are reaped by Mongo once expiresAt passes
+    IndexSpec("recommendation_cache", [("expiresAt", ASCENDING)], {"expireAfterSeconds": 0}),
+    # LLM memo: TTL expiry, least-recently-used pruning and most-hit warm-up
+    IndexSpec("llm_memo", [("expiresAt", ASCENDING)], {"expireAfterSeconds": 0}),
+    IndexSpec("llm_memo", [("lastUsedAt", ASCENDING)]),
+    IndexSpec("llm_memo", [("hits", DESCENDING)]),
+]
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+
+
+# Representative query per endpoint; values are placeholders, only the shape matters to the planner
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("GET /products?category", "products", {"category": "Shirts"}),
+    QueryShape("GET /products?category&sort=price_asc", "products", {"category": "Shirts"}, [("price", 1)]),
+    QueryShape("GET /products?category&sort=newest", "products", {"category": "Shirts"}, [("createdAt", -1)]),
+    QueryShape("GET /products?sort=price_desc", "products", {}, [("price", -1)]),
+    QueryShape("GET /products/page?sort=price_asc", "products", {}, [("price", 1), ("_id", 1)]),
+    QueryShape("GET /products/page?sort=newest", "products", {}, [("createdAt", -1), ("_id", -1)]),
+    QueryShape("GET /collections?featured", "collections", {"featured": True}),
+    QueryShape("POST /auth/login", "users", {"email": "someone@example.com"}),
+    QueryShape("GET /cart/{userId}", "carts", {"userId": "000000000000000000000000"}),
+    QueryShape("GET /wishlist/{userId}", "wishlists", {"userId": "000000000000000000000000"}),
+    QueryShape("GET /orders/user/{userId}", "orders", {"userId": "000000000000000000000000"}, [("createdAt", -1)]),
+    QueryShape("GET /orders/{id}", "orders", {"$or": [{"_id": ObjectId("000000000000000000000000")}, {"orderId": "000000000000000000000000"}]}),
+    QueryShape("GET /orders/user/{userId}/summary", "order_summaries", {"userId": "000000000000000000000000"}, [("createdAt", -1), ("_id", -1)]),
+    QueryShape("GET /outfits", "outfits", {"userId": "000000000000000000000000"}, [("createdAt", -1)]),
+    QueryShape("GET /user/payments", "paymentmethods", {"userId": "000000000000000000000000"}),
+]
+
+
+async def ensure_indexes(db, specs: List[IndexSpec] = INDEXES) -> Dict[str, List[str]]:
+    # create_indexes is a no-op for indexes that already exist with the same definition, so
+    # this is safe on every startup. A failure on one collection (e.g. duplicate emails
+    # blocking the unique index) is logged and doesn't stop the others.
+    by_collection: Dict[str, List[IndexModel]] = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(IndexModel(spec.keys, **spec.options))
+
+    created = {}
+    for name, models in by_collection.items():
+        try:
+            created[name] = await db.get_collection(name).create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Could not build indexes on {name}: {e}")
+    return created
+
+
+async def missing_unique_indexes(db, specs: List[IndexSpec] = INDEXES) -> List[IndexSpec]:
+    # Unique indexes are correctness, not speed: carts.userId and wishlists.userId turn a racing
+    # first add into a retry and (userId, idempotencyKey) stops duplicate orders on checkout retries
+    missing = []
+    for spec in specs:
+        if not spec.options.get("unique"):
+            continue
+        existing = await db.get_collection(spec.collection).index_information()
+        keys = [(field, int(direction)) for field, direction in spec.keys]
+        if not any(
+            info.get("unique") and [(field, int(direction)) for field, direction in info["key"]] == keys
+            for info in existing.values()
+        ):
+            missing.append(spec)
+    return missing
+
+
+def plan_stages(plan) -> List[str]:
+    # All stage names in an explain plan tree, whichever engine (classic or SBE) produced it
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+async def explain_shape(db, shape: QueryShape) -> dict:
+    find = SON([("find", shape.collection), ("filter", shape.filter)])
+    if shape.sort:
+        find["sort"] = SON(shape.sort)
+    result = await db.command(SON([("explain", find), ("verbosity", "queryPlanner")]))
+    winning = result.get("queryPlanner", {}).get("winningPlan", {})
+    stages = plan_stages(winning)
+    return {
+        "shape": shape.name,
+        "collection": shape.collection,
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        # An in-memory SORT means the index doesn't cover the sort order
+        "blockingSort": "SORT" in stages,
+    }
+
+
+async def check_query_plans(db, shapes: List[QueryShape] = QUERY_SHAPES) -> List[dict]:
+    reports = []
+    for shape in shapes:
+        try:
+            report = await explain_shape(db, shape)
+        except OperationFailure as e:
+            report = {"shape": shape.name, "collection": shape.collection, "error": str(e)}
+        if report.get("collscan"):
+            logger.warning(f"COLLSCAN: {shape.name} on {shape.collection} ({' > '.join(report['stages'])})")
+        reports.append(report)
+    return reports
+
+
+# --- CLI ---
+#
+#   python indexes.py            build missing indexes
+#   python indexes.py --check    build, then explain every query shape; exits 1 on any COLLSCAN
+
+async def _main(args) -> int:
+    from database import db
+
+    if not args.no_apply:
+        created = await ensure_indexes(db)
+        print(json.dumps({"indexes": created}))
+    if not args.check:
+        return 0
+    reports = await check_query_plans(db)
+    for report in reports:
+        print(json.dumps(report))
+    return 1 if any(r.get("collscan") or r.get("error") for r in reports) else 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Apply the index registry and check query plans")
+    parser.add_argument("--check", action="store_true", help="Explain every registered query shape and flag COLLSCANs")
+    parser.add_argument("--no-apply", action="store_true", help="Don't create indexes, only check")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
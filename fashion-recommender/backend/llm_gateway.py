@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+
+from metrics import LLM_CALL_SECONDS, LLM_QUEUE_SECONDS, LLM_REQUESTS, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Gateway settings (override via env)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "800"))
+LLM_FAKE_JITTER_MS = float(os.getenv("LLM_FAKE_JITTER_MS", "200"))
+# Ask the model for JSON matching the caller's response schema instead of free text
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeoutError(LLMError):
+    pass
+
+
+# --- Backends ---
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL):
+        self.model = model
+        self._api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        # google.genai takes hundreds of ms to import; pay for it on the first request, not at startup
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self._api_key)
+        return self._client
+
+    async def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        config = None
+        if schema is not None and LLM_STRUCTURED_OUTPUT:
+            config = {"response_mime_type": "application/json", "response_schema": schema}
+        # Native async API: the request runs on the event loop without tying up a worker thread
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=config
+        )
+        usage = response.usage_metadata
+        if usage is not None:
+            LLM_TOKENS.inc(self.name, "prompt", amount=usage.prompt_token_count or 0)
+            LLM_TOKENS.inc(self.name, "output", amount=usage.candidates_token_count or 0)
+        return response.text
+
+
+class FakeBackend:
+    # Offline stand-in with simulated latency, used for load tests and local dev
+    name = "fake"
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS, jitter_ms: float = LLM_FAKE_JITTER_MS, model: str = "fake-stylist"):
+        self.model = model
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+
+    async def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        # Candidate lines of the stylist prompt ("<id>|name|..."), else JSON ids
+        candidate_ids = re.findall(r"^(\w+)\|", prompt, re.M) or re.findall(r'"id": "([^"]+)"', prompt)
+        selected = random.sample(candidate_ids, min(3, len(candidate_ids)))
+        text = json.dumps({
+            "selected_ids": selected,
+            "style_tips": ["Keep the palette tight.", "Match the shoe tone to the belt.", "Let one piece stand out."]
+        })
+        # Rough 4-characters-per-token estimate, so load tests still exercise the token metrics
+        LLM_TOKENS.inc(self.name, "prompt", amount=len(prompt) // 4)
+        LLM_TOKENS.inc(self.name, "output", amount=len(text) // 4)
+        return text
+
+
+# --- Gateway ---
+
+class LLMGateway:
+    def __init__(self, backend=None, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def model(self) -> Optional[str]:
+        return self.backend.model if self.backend else None
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, schema: Optional[dict] = None) -> str:
+        if not self.backend:
+            raise LLMError("No LLM backend configured")
+
+        # The timeout covers waiting for a slot as well as the call itself, so a
+        # saturated gateway fails fast and the caller can fall back.
+        try:
+            text = await asyncio.wait_for(self._call(prompt, schema), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            LLM_REQUESTS.inc(self.backend.name, "timeout")
+            raise LLMTimeoutError(f"LLM call exceeded {timeout or self.timeout}s")
+        except asyncio.CancelledError:
+            # Client went away; the in-flight backend call has been cancelled with us
+            self.cancelled += 1
+            LLM_REQUESTS.inc(self.backend.name, "cancelled")
+            raise
+        except LLMError:
+            LLM_REQUESTS.inc(self.backend.name, "error")
+            raise
+        LLM_REQUESTS.inc(self.backend.name, "ok")
+        return text
+
+    async def _call(self, prompt: str, schema: Optional[dict]) -> str:
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        LLM_QUEUE_SECONDS.observe(started - queued, self.backend.name)
+
+        self.in_flight += 1
+        try:
+            text = await self.backend.generate(prompt, schema)
+            self.completed += 1
+            return text
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            raise LLMError(str(e)) from e
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            LLM_CALL_SECONDS.observe(time.perf_counter() - started, self.backend.name)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name if self.backend else None,
+            "model": self.model,
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+        }
+
+
+def build_gateway_from_env() -> LLMGateway:
+    backend = None
+    if LLM_BACKEND == "fake":
+        backend = FakeBackend()
+        logger.info(f"Using fake LLM backend ({LLM_FAKE_LATENCY_MS}ms simulated latency)")
+    elif LLM_BACKEND == "gemini":
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            logger.warning("GEMINI_API_KEY is not set.")
+        else:
+            backend = GeminiBackend(api_key=api_key)
+    elif LLM_BACKEND != "none":
+        logger.warning(f"Unknown LLM_BACKEND '{LLM_BACKEND}', LLM disabled.")
+
+    return LLMGateway(backend=backend)
@@ -0,0 +1,202 @@
+import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Stylist replies persisted in the llm_memo collection, shared by every worker and kept across
+# restarts and deploys. Keys hash the model and the full prompt, so a changed candidate set,
+# product or instruction text is simply a different key and nothing needs invalidating.
+LLM_MEMO_ENABLED = os.getenv("LLM_MEMO_ENABLED", "1") == "1"
+LLM_MEMO_TTL_SECONDS = float(os.getenv("LLM_MEMO_TTL_SECONDS", str(7 * 24 * 3600)))
+# Upper bound on stored replies; least recently used ones are deleted beyond it
+LLM_MEMO_MAX_ENTRIES = int(os.getenv("LLM_MEMO_MAX_ENTRIES", "50000"))
+# Per-worker copy of the hottest replies, loaded from the most-hit keys at startup
+LLM_MEMO_LOCAL_ENTRIES = int(os.getenv("LLM_MEMO_LOCAL_ENTRIES", "2048"))
+LLM_MEMO_WARM_KEYS = int(os.getenv("LLM_MEMO_WARM_KEYS", "500"))
+# Size check after this many writes, and hit-count write-back after this many hits
+LLM_MEMO_PRUNE_EVERY = 100
+LLM_MEMO_HIT_FLUSH_EVERY = 100
+
+
+def memo_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMMemo:
+    def __init__(self, collection, ttl: float = LLM_MEMO_TTL_SECONDS, max_entries: int = LLM_MEMO_MAX_ENTRIES,
+                 local_entries: int = LLM_MEMO_LOCAL_ENTRIES):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.local_entries = local_entries
+        # key -> (expiresAt, value); an entry past the stored expiry is a miss here too
+        self._local: "OrderedDict[str, Tuple[datetime, dict]]" = OrderedDict()
+        # Hits not yet added to the stored hit counts and lastUsedAt (they decide what gets
+        # warmed and what gets pruned); written back in the background
+        self._pending_hits: Dict[str, int] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._writes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.pruned = 0
+        self.warmed = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = datetime.now()
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._local.move_to_end(key)
+                self.hits += 1
+                self._count_hit(key)
+                return value
+            del self._local[key]
+
+        try:
+            doc = await self.collection.find_one({"_id": key, "expiresAt": {"$gt": now}}, {"value": 1, "expiresAt": 1})
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM memo read failed: {e}")
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.shared_hits += 1
+        self._count_hit(key)
+        self._store(key, doc["value"], doc.get("expiresAt"))
+        return doc["value"]
+
+    def _count_hit(self, key: str):
+        self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        if sum(self._pending_hits.values()) >= LLM_MEMO_HIT_FLUSH_EVERY:
+            task = asyncio.ensure_future(self._write_hits())
+            # The loop only holds weak references to tasks
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def set(self, key: str, value: dict, model: str, inputs: Optional[dict] = None):
+        now = datetime.now()
+        self._store(key, value, now + timedelta(seconds=self.ttl))
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {
+                    "$set": {"value": value, "model": model, "inputs": inputs, "lastUsedAt": now,
+                             "expiresAt": now + timedelta(seconds=self.ttl)},
+                    "$setOnInsert": {"createdAt": now, "hits": 0},
+                },
+                upsert=True
+            )
+            self.stored += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM memo write failed: {e}")
+            return
+        self._writes += 1
+        if self._writes % LLM_MEMO_PRUNE_EVERY == 0:
+            await self.prune()
+
+    def _store(self, key: str, value: dict, expires_at: Optional[datetime] = None):
+        self._local[key] = (expires_at or datetime.now() + timedelta(seconds=self.ttl), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    async def prune(self) -> int:
+        # TTL expiry alone doesn't bound the collection; trim the least recently used surplus
+        try:
+            surplus = await self.collection.estimated_document_count() - self.max_entries
+            if surplus <= 0:
+                return 0
+            cursor = self.collection.find({}, {"_id": 1}).sort("lastUsedAt", 1).limit(surplus)
+            ids = [doc["_id"] async for doc in cursor]
+            result = await self.collection.delete_many({"_id": {"$in": ids}})
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM memo prune failed: {e}")
+            return 0
+        self.pruned += result.deleted_count
+        logger.info(f"LLM memo pruned {result.deleted_count} least recently used replies")
+        return result.deleted_count
+
+    async def flush_hits(self):
+        # Waits for write-backs already running, then writes whatever is left (e.g. at shutdown)
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self._write_hits()
+
+    async def _write_hits(self):
+        pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+        now = datetime.now()
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({"_id": key}, {"$inc": {"hits": count}, "$set": {"lastUsedAt": now}})
+                 for key, count in pending.items()],
+                ordered=False
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM memo hit write-back failed: {e}")
+
+    async def warm(self, limit: int = LLM_MEMO_WARM_KEYS) -> int:
+        # Loads the most-hit replies into this worker, so traffic after a deploy or restart
+        # starts from memory instead of one Mongo read (or LLM call) per key
+        limit = min(limit, self.local_entries)
+        if limit <= 0:
+            return 0
+        try:
+            cursor = self.collection.find(
+                {"expiresAt": {"$gt": datetime.now()}}, {"value": 1, "expiresAt": 1}
+            ).sort("hits", -1).limit(limit)
+            docs = [doc async for doc in cursor]
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"LLM memo warm-up failed: {e}")
+            return 0
+        # Least popular first, so the hottest end up most recently used
+        for doc in reversed(docs):
+            self._store(doc["_id"], doc["value"], doc.get("expiresAt"))
+        self.warmed += len(docs)
+        logger.info(f"LLM memo warmed with {len(docs)} replies")
+        return len(docs)
+
+    async def popular_inputs(self, limit: int) -> List[dict]:
+        # Request inputs (productId, occasion, gender) of the most-hit replies, for replaying them
+        cursor = self.collection.find(
+            {"expiresAt": {"$gt": datetime.now()}, "inputs.productId": {"$ne": None}}, {"inputs": 1}
+        ).sort("hits", -1).limit(limit)
+        return [doc["inputs"] async for doc in cursor]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "localEntries": len(self._local),
+            "maxLocalEntries": self.local_entries,
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "pruned": self.pruned,
+            "warmed": self.warmed,
+            "errors": self.errors,
+            "hitRate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_memo_from_env(collection) -> Optional[LLMMemo]:
+    return LLMMemo(collection) if LLM_MEMO_ENABLED else None
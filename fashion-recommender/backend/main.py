@@ -1,84 +1,186 @@
 import os
+import re
 import json
+import time
 import logging
-import random
 from datetime import datetime
 from typing import List, Optional
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Body, Query, Depends, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Body, Query, Depends, Header, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, BeforeValidator
 from dotenv import load_dotenv
 
 # Load environment variables
 env_path = Path(__file__).resolve().parent.parent / '.env.local'
-print(f"Loading env from: {env_path}")
-print(f"File exists: {env_path.exists()}")
 load_dotenv(dotenv_path=env_path)
 load_dotenv()
 
-import os
-print(f"MONGODB_URI: {os.getenv('MONGODB_URI')}")
-
-from google import genai
-from google.genai import types
 from bson import ObjectId
-import bcrypt
-
-from database import product_collection, cart_collection, user_collection, wishlist_collection, order_collection, collection_collection, outfit_collection, payment_collection
+from pymongo.errors import DuplicateKeyError
+
+from database import client, db, product_collection, cart_collection, user_collection, wishlist_collection, order_collection, collection_collection, outfit_collection, payment_collection, recommendation_cache_collection, catalog_meta_collection, precomputed_outfit_collection, order_summary_collection, llm_memo_collection, product_read_collection, collection_read_collection, pool_monitor, close_database, on_first_use
+from llm_gateway import build_gateway_from_env
+from llm_memo import build_memo_from_env, memo_key
+from prompts import STYLIST_RESPONSE_SCHEMA, StylistParseError, build_stylist_prompt, parse_stylist_reply
+from db_pool import MONGO_CATALOG_READ_PREFERENCE
+from indexes import INDEX_DIAGNOSTICS, check_query_plans, ensure_indexes, missing_unique_indexes
+from recommend_cache import build_cache_from_env, recommendation_key
+from singleflight import SingleFlight
+from catalog import CatalogStore
+from product_cache import ProductCache
+from carts import CartNotFound
+from checkout import CheckoutEngine, CheckoutError
+from order_summaries import ORDER_SUMMARY_SORT
+from session_store import build_session_stores
+from precompute import PrecomputeJob, product_query
+from passwords import PasswordHasher, PasswordPoolSaturated
+from search_index import is_searchable
+from fast_json import FAST_RESPONSES, trusted_response
+from metrics import METRICS_ENABLED, RECOMMEND_RESULTS, MetricsMiddleware, record_span, register_gauge, render as render_metrics, span
+from pagination import InvalidCursor, apply_cursor, encode_cursor
+from seed_import import SEED_BATCH_SIZE, SeedImporter, ndjson_lines, record_from_line, records_from_seed
 from models import (
     ProductModel, CartModel, CartItemModel, UserModel, UserCreate, UserLogin,
     WishlistModel, WishlistResponse, OrderModel, OrderCreate, CollectionModel, OutfitModel, OutfitCreate, UserProfileUpdate,
-    PaymentMethodModel, PaymentMethodCreate, ChangePasswordRequest, SeedRequest
+    PaymentMethodModel, PaymentMethodCreate, ChangePasswordRequest, SeedRequest, ProductPage, OrderSummaryPage
 )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI
-app = FastAPI(title="Fashion Recommender AI API")
+# Initialize FastAPI (startup / shutdown steps are listed under Lifecycle at the bottom)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(title="Fashion Recommender AI API", lifespan=lifespan)
+
+# Per-route latency, DB round trips per request and optional trace spans (see metrics.py)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Indexes from the registry in indexes.py; idempotent, so every worker applies them on startup
+async def prepare_indexes():
+    try:
+        await ensure_indexes(db)
+        if INDEX_DIAGNOSTICS:
+            await check_query_plans(db)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+
+async def prepare_indexes_deferred():
+    # LAZY_INIT: runs in the background on first Mongo use instead of at startup
+    await prepare_indexes()
+    try:
+        missing = await missing_unique_indexes(db)
+    except Exception as e:
+        logger.error(f"Unique index check failed: {e}")
+        return
+    for spec in missing:
+        logger.warning(
+            f"Unique index {spec.keys} on {spec.collection} is missing: concurrent first cart/wishlist adds "
+            f"and checkout retries can create duplicates (run python indexes.py)"
+        )
+
+# Security (bcrypt runs in a bounded pool so it never blocks the event loop)
+password_hasher = PasswordHasher()
+
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-# Security
-def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
-def get_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+@app.exception_handler(PasswordPoolSaturated)
+async def password_pool_saturated_handler(request: Request, exc: PasswordPoolSaturated):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"}, headers={"Retry-After": "1"})
+
+async def stop_password_pool():
+    password_hasher.shutdown()
+
+# Configure Gemini (async, concurrency-limited gateway; LLM_BACKEND=fake for offline runs)
+llm_gateway = build_gateway_from_env()
+
+# Stylist replies persisted in Mongo across restarts and workers (LLM_MEMO_ENABLED=0 to turn off)
+llm_memo = build_memo_from_env(llm_memo_collection)
+
+# Outfit response cache (TTL + LRU, optional shared Mongo tier via RECOMMEND_CACHE_SHARED=mongo)
+recommendation_cache = build_cache_from_env(recommendation_cache_collection)
+recommendation_flight = SingleFlight()
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-client = None
-if not GEMINI_API_KEY:
-    logger.warning("GEMINI_API_KEY is not set.")
-else:
-    client = genai.Client(api_key=GEMINI_API_KEY)
 
 # --- Helper Functions ---
 
-def map_category(category: str) -> str:
-    category = category.lower()
-    
-    # Full Body / Sets
-    if any(x in category for x in ["set", "suit", "sherwani", "pajama", "co-ords", "overall", "jumpsuit"]):
-        return "FullBody"
-        
-    # Bottoms
-    if any(x in category for x in ["jeans", "trouser", "pant", "chinos", "jogger", "short", "bottom", "skirt", "legging"]):
-        return "Bottoms"
-        
-    # Outerwear
-    if any(x in category for x in ["jacket", "blazer", "coat", "bandhgala", "vest", "cardigan"]):
-        return "Outerwear"
-        
-    # Tops (check this last to avoid matching "Kurta Set" as Top if not caught by FullBody)
-    if any(x in category for x in ["shirt", "top", "tee", "t-shirt", "kurta", "tunic", "blouse"]):
-        return "Tops"
-        
-    # Shoes
-    if any(x in category for x in ["shoe", "sneaker", "boot", "sandal", "footwear", "heel", "flat"]):
-        return "Shoes"
-        
-    return "Accessories"
+# "llm": local ranking pre-filters candidates for the LLM; "local": ranking only, no LLM call
+RECOMMEND_MODE = os.getenv("RECOMMEND_MODE", "llm")
+RANKING_PREFILTER_K = int(os.getenv("RANKING_PREFILTER_K", "12"))
+
+# In-memory catalog snapshot (compact records grouped by outfit slot) for candidate selection
+catalog = CatalogStore(product_collection, catalog_meta_collection)
+
+# Product documents by id for hydration (wishlist, cart and outfit items, /products/{id}, /recommend)
+product_cache = ProductCache(product_collection)
+
+async def on_catalog_change():
+    product_cache.invalidate()
+    await recommendation_cache.invalidate(shared=False)
+
+catalog.on_change(on_catalog_change)
+
+async def start_catalog():
+    if not LAZY_INIT:
+        try:
+            await catalog.get()
+        except Exception as e:
+            # Retried lazily on the first /recommend
+            logger.error(f"Failed to load catalog snapshot: {e}")
+    catalog.start(on_first_load=LAZY_INIT)
+
+async def stop_catalog():
+    await catalog.stop()
+
+async def warm_llm_memo():
+    if llm_memo and not LAZY_INIT:
+        await llm_memo.warm()
+
+async def flush_llm_memo():
+    if llm_memo:
+        await llm_memo.flush_hits()
+
+def as_object_id(value: str):
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+async def hydrate_products(product_ids: List[str]) -> list:
+    # Full documents for the few products we actually return, in the given order
+    return await product_cache.get_ordered(product_ids)
+
+def list_response(docs: List[dict], model):
+    # FAST_RESPONSES: skip response_model validation for our own documents (see fast_json.py)
+    return trusted_response(docs, model) if FAST_RESPONSES else docs
+
+CART_ITEM_FIELDS = {"name": "name", "price": "price", "image": "imageUrl"}
+OUTFIT_ITEM_FIELDS = {"name": "name", "price": "price", "image": "imageUrl", "category": "category"}
+
+async def with_current_products(docs: List[dict], fields: dict) -> List[dict]:
+    # Line items show the catalog's current name/price/image; one batched lookup covers all docs
+    products = await product_cache.get_many(i["productId"] for d in docs for i in d.get("items", []))
+    enriched = []
+    for doc in docs:
+        items = []
+        for item in doc.get("items", []):
+            product = products.get(item["productId"])
+            if product:
+                item = {**item, **{k: product[src] for k, src in fields.items() if product.get(src) is not None}}
+            items.append(item)
+        enriched.append({**doc, "items": items})
+    return enriched
 
 # --- Auth Endpoints ---
 
@@ -88,13 +190,17 @@ async def signup(user: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_dict = user.dict()
     user_dict["password"] = hashed_password
     user_dict["createdAt"] = datetime.now()
     user_dict["updatedAt"] = datetime.now()
     
-    new_user = await user_collection.insert_one(user_dict)
+    try:
+        new_user = await user_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup; the unique email index caught it
+        raise HTTPException(status_code=400, detail="Email already registered")
     created_user = await user_collection.find_one({"_id": new_user.inserted_id})
     return created_user
 
@@ -104,7 +210,7 @@ async def login(user_credentials: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(user_credentials.password, user["password"]):
+    if not await verify_password(user_credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
         
     return user
@@ -136,10 +242,10 @@ async def change_password(password_data: ChangePasswordRequest, userId: str = Qu
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    if not verify_password(password_data.currentPassword, user["password"]):
+    if not await verify_password(password_data.currentPassword, user["password"]):
         raise HTTPException(status_code=400, detail="Incorrect current password")
         
-    hashed_password = get_password_hash(password_data.newPassword)
+    hashed_password = await get_password_hash(password_data.newPassword)
     await user_collection.update_one({"_id": ObjectId(userId)}, {"$set": {"password": hashed_password, "updatedAt": datetime.now()}})
     
     return {"message": "Password updated successfully"}
@@ -158,8 +264,32 @@ async def get_collections(featured: Optional[bool] = None):
     query = {}
     if featured is not None:
         query["featured"] = featured
-    collections = await collection_collection.find(query).to_list(100)
-    return collections
+    collections = await collection_read_collection.find(query).to_list(100)
+    return list_response(collections, CollectionModel)
+
+SEARCH_RESULT_LIMIT = 1000
+
+async def search_product_ids(search: str, category: Optional[str] = None) -> Optional[List[str]]:
+    # Ranked ids from the in-memory search index; None if the catalog snapshot isn't available
+    if not is_searchable(search):
+        return None
+    try:
+        snapshot = await catalog.get()
+    except Exception as e:
+        logger.error(f"Search index unavailable, falling back to regex: {e}")
+        return None
+    return snapshot.search_ids(search, SEARCH_RESULT_LIMIT, category)
+
+async def apply_search(query: dict, search: str) -> Optional[List[str]]:
+    # A category already in the query is applied inside the index lookup, so the top
+    # SEARCH_RESULT_LIMIT hits are all in that category
+    product_ids = await search_product_ids(search, query.get("category"))
+    if product_ids is None:
+        # Escaped so user input is matched literally
+        query["name"] = {"$regex": re.escape(search), "$options": "i"}
+    else:
+        query["_id"] = {"$in": [as_object_id(i) for i in product_ids]}
+    return product_ids
 
 @app.get("/products", response_model=List[ProductModel])
 async def get_products(
@@ -168,12 +298,13 @@ async def get_products(
     sort: Optional[str] = None
 ):
     query = {}
+    ranked_ids = None
     if category:
         query["category"] = category
     if search:
-        query["name"] = {"$regex": search, "$options": "i"}
+        ranked_ids = await apply_search(query, search)
         
-    cursor = product_collection.find(query)
+    cursor = product_read_collection.find(query)
     
     if sort == "price_asc":
         cursor = cursor.sort("price", 1)
@@ -183,7 +314,85 @@ async def get_products(
         cursor = cursor.sort("createdAt", -1)
         
     products = await cursor.to_list(1000)
-    return products
+    if ranked_ids and not sort:
+        # No explicit sort: keep search relevance order
+        rank = {pid: i for i, pid in enumerate(ranked_ids)}
+        products.sort(key=lambda p: rank.get(str(p["_id"]), len(rank)))
+    return list_response(products, ProductModel)
+
+@app.get("/products/suggest")
+async def suggest_products(q: str, limit: int = Query(8, ge=1, le=20)):
+    # Typeahead straight from the in-memory catalog; no database round trip
+    snapshot = await catalog.get()
+    results = []
+    for product_id in snapshot.search.search(q, limit):
+        record = snapshot.by_id.get(product_id)
+        if record:
+            results.append({"_id": record.id, "name": record.name, "category": record.category, "price": record.price, "imageUrl": record.image})
+    return results
+
+# Keyset sort specs per sort mode; _id is the tiebreaker so pages never skip or repeat
+PRODUCT_PAGE_SORTS = {
+    "price_asc": [("price", 1), ("_id", 1)],
+    "price_desc": [("price", -1), ("_id", -1)],
+    "newest": [("createdAt", -1), ("_id", -1)],
+    None: [("_id", 1)],
+}
+# "card" is what ProductCard renders
+PRODUCT_VIEWS = {
+    "card": ["name", "price", "imageUrl", "images", "brand", "category", "match"],
+}
+PRODUCT_FIELDS = set(ProductModel.model_fields) - {"id"}
+PRODUCT_PAGE_MAX_LIMIT = 100
+
+@app.get("/products/page", response_model=ProductPage)
+async def get_products_page(
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(24, ge=1, le=PRODUCT_PAGE_MAX_LIMIT),
+    view: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    if sort not in PRODUCT_PAGE_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort '{sort}'")
+    sort_spec = PRODUCT_PAGE_SORTS[sort]
+
+    query = {}
+    if category:
+        query["category"] = category
+    if search:
+        await apply_search(query, search)
+    try:
+        query = apply_cursor(query, sort_spec, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    projection = None
+    requested = None
+    if view or fields:
+        if view and view not in PRODUCT_VIEWS:
+            raise HTTPException(status_code=400, detail=f"Unknown view '{view}'")
+        requested = set(PRODUCT_VIEWS[view]) if view else set()
+        if fields:
+            requested |= {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = requested - PRODUCT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        # Sort keys ride along so the next cursor can be built; stripped below if not requested
+        projection = {f: 1 for f in requested | {field for field, _ in sort_spec}}
+
+    docs = await product_read_collection.find(query, projection).sort(sort_spec).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort_spec) if len(docs) > limit else None
+
+    items = []
+    for doc in docs[:limit]:
+        if requested is not None:
+            doc = {k: v for k, v in doc.items() if k in requested or k == "_id"}
+        doc["_id"] = str(doc["_id"])
+        items.append(doc)
+    return {"items": items, "nextCursor": next_cursor}
 
 @app.get("/products/random", response_model=ProductModel)
 async def get_random_product():
@@ -191,97 +400,56 @@ async def get_random_product():
         {"$match": {"imageUrl": {"$exists": True, "$ne": ""}}},
         {"$sample": {"size": 1}}
     ]
-    products = await product_collection.aggregate(pipeline).to_list(1)
+    products = await product_read_collection.aggregate(pipeline).to_list(1)
     if not products:
         raise HTTPException(status_code=404, detail="No products found")
     return products[0]
 
 @app.get("/products/{id}", response_model=ProductModel)
 async def get_product(id: str):
-    try:
-        product = await product_collection.find_one({"_id": ObjectId(id)})
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return product
-    except:
+    product = await product_cache.get(id)
+    if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    return product
 
 # --- Cart ---
 
+# Carts and wishlists: atomic Mongo updates, or SESSION_STORE=memory for the write-behind tier
+carts, wishlists, session_tiers = build_session_stores(cart_collection, wishlist_collection)
+
+async def start_session_store():
+    for tier in session_tiers:
+        tier.start()
+
+async def flush_session_store():
+    for tier in session_tiers:
+        await tier.stop()
+
 @app.get("/cart/{userId}", response_model=CartModel)
 async def get_cart(userId: str):
-    cart = await cart_collection.find_one({"userId": userId})
-    if not cart:
-        # Create empty cart
-        cart_doc = {"userId": userId, "items": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}
-        result = await cart_collection.insert_one(cart_doc)
-        cart = await cart_collection.find_one({"_id": result.inserted_id})
-    return cart
+    return (await with_current_products([await carts.get(userId)], CART_ITEM_FIELDS))[0]
 
 @app.post("/cart/{userId}/add", response_model=CartModel)
 async def add_to_cart(userId: str, item: CartItemModel):
-    cart = await cart_collection.find_one({"userId": userId})
-    if not cart:
-        cart_doc = {"userId": userId, "items": [item.dict()], "createdAt": datetime.now(), "updatedAt": datetime.now()}
-        await cart_collection.insert_one(cart_doc)
-    else:
-        # Check if item exists
-        items = cart.get("items", [])
-        existing_item = next((i for i in items if i["productId"] == item.productId), None)
-        if existing_item:
-            existing_item["quantity"] += item.quantity
-        else:
-            items.append(item.dict())
-        
-        await cart_collection.update_one({"userId": userId}, {"$set": {"items": items, "updatedAt": datetime.now()}})
-        
-    return await cart_collection.find_one({"userId": userId})
+    cart = await carts.add(userId, item.dict())
+    return (await with_current_products([cart], CART_ITEM_FIELDS))[0]
 
 @app.put("/cart/{userId}/update", response_model=CartModel)
 async def update_cart(userId: str, item: CartItemModel):
-    cart = await cart_collection.find_one({"userId": userId})
-    if not cart:
-         raise HTTPException(status_code=404, detail="Cart not found")
-         
-    items = cart.get("items", [])
-    
-    new_items = []
-    for i in items:
-        if i["productId"] == item.productId:
-            if item.quantity > 0:
-                i["quantity"] = item.quantity
-                if item.size: i["size"] = item.size
-                if item.color: i["color"] = item.color
-                new_items.append(i)
-        else:
-            new_items.append(i)
-            
-    await cart_collection.update_one({"userId": userId}, {"$set": {"items": new_items, "updatedAt": datetime.now()}})
-    return await cart_collection.find_one({"userId": userId})
+    try:
+        cart = await carts.update(userId, item.dict())
+    except CartNotFound:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return (await with_current_products([cart], CART_ITEM_FIELDS))[0]
 
 # --- Wishlist ---
 
 @app.get("/wishlist/{userId}", response_model=WishlistResponse)
 async def get_wishlist(userId: str):
-    wishlist = await wishlist_collection.find_one({"userId": userId})
-    if not wishlist:
-        wishlist = {"userId": userId, "products": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}
-        await wishlist_collection.insert_one(wishlist)
-        return wishlist
-
-    # Populate products
-    product_ids = wishlist.get("products", [])
-    populated_products = []
-    if product_ids:
-        object_ids = []
-        for pid in product_ids:
-            try:
-                object_ids.append(ObjectId(pid))
-            except:
-                continue
-        
-        if object_ids:
-            populated_products = await product_collection.find({"_id": {"$in": object_ids}}).to_list(len(object_ids))
+    wishlist = await wishlists.get(userId)
+
+    # Populate products (validated once per cached product, not on every view)
+    populated_products = await product_cache.get_models(wishlist.get("products", []), ProductModel)
 
     return {
         "_id": wishlist.get("_id"),
@@ -296,69 +464,60 @@ async def add_to_wishlist(userId: str, body: dict = Body(...)):
     productId = body.get("productId")
     if not productId:
          raise HTTPException(status_code=400, detail="ProductId required")
-         
-    wishlist = await wishlist_collection.find_one({"userId": userId})
-    if not wishlist:
-        await wishlist_collection.insert_one({"userId": userId, "products": [productId], "createdAt": datetime.now(), "updatedAt": datetime.now()})
-    else:
-        if productId not in wishlist["products"]:
-            await wishlist_collection.update_one({"userId": userId}, {"$push": {"products": productId}, "$set": {"updatedAt": datetime.now()}})
-            
+    await wishlists.add(userId, productId)
     return {"message": "Added to wishlist"}
 
 @app.delete("/wishlist/{userId}/remove/{productId}")
 async def remove_from_wishlist(userId: str, productId: str):
-    await wishlist_collection.update_one({"userId": userId}, {"$pull": {"products": productId}, "$set": {"updatedAt": datetime.now()}})
+    await wishlists.remove(userId, productId)
     return {"message": "Removed from wishlist"}
 
 # --- Orders & Checkout ---
 
+# Server-side pricing, stock reservation and idempotent retries; see checkout.py
+# Stock isn't part of the catalog snapshot, so reservations evict the affected products directly
+checkout_engine = CheckoutEngine(
+    product_collection, order_collection, carts, summaries=order_summary_collection, client=client,
+    on_stock_change=product_cache.evict
+)
+
 @app.post("/checkout", response_model=OrderModel)
-async def create_order(order_data: OrderCreate):
-    order_id = f"#ORD-{random.randint(100000, 999999)}-{random.randint(100, 999)}"
-    
-    order_doc = order_data.dict()
-    order_doc["orderId"] = order_id
-    order_doc["status"] = "Processing"
-    order_doc["paymentMethod"] = "Credit Card (Mock)"
-    order_doc["createdAt"] = datetime.now()
-    order_doc["updatedAt"] = datetime.now()
-    
-    result = await order_collection.insert_one(order_doc)
-    
-    # Clear Cart
-    await cart_collection.update_one({"userId": order_data.userId}, {"$set": {"items": []}})
-    
-    created_order = await order_collection.find_one({"_id": result.inserted_id})
-    return created_order
+async def create_order(order_data: OrderCreate, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    try:
+        return await checkout_engine.checkout(order_data.dict(), idempotency_key)
+    except CheckoutError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 @app.get("/orders/user/{userId}", response_model=List[OrderModel])
 async def get_user_orders(userId: str):
     orders = await order_collection.find({"userId": userId}).sort("createdAt", -1).to_list(100)
-    return orders
+    return list_response(orders, OrderModel)
+
+ORDER_SUMMARY_MAX_LIMIT = 100
+
+@app.get("/orders/user/{userId}/summary", response_model=OrderSummaryPage)
+async def get_user_order_summaries(userId: str, cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=ORDER_SUMMARY_MAX_LIMIT)):
+    try:
+        query = apply_cursor({"userId": userId}, ORDER_SUMMARY_SORT, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    docs = await order_summary_collection.find(query, {"userId": 0}).sort(ORDER_SUMMARY_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], ORDER_SUMMARY_SORT) if len(docs) > limit else None
+    return {"items": docs[:limit], "nextCursor": next_cursor}
 
 @app.get("/orders/{id}", response_model=OrderModel)
 async def get_order(id: str, userId: str = Query(...)):
-    try:
-        order = await order_collection.find_one({"_id": ObjectId(id)})
-        if not order:
-             order = await order_collection.find_one({"orderId": id})
-        
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-            
-        if order["userId"] != userId:
-             raise HTTPException(status_code=403, detail="Unauthorized")
-             
-        return order
-    except:
-        # Fallback for invalid ObjectId
-        order = await order_collection.find_one({"orderId": id})
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if order["userId"] != userId:
-             raise HTTPException(status_code=403, detail="Unauthorized")
-        return order
+    # Either id form in one query: the Mongo _id or the display orderId
+    if ObjectId.is_valid(id):
+        query = {"$or": [{"_id": ObjectId(id)}, {"orderId": id}]}
+    else:
+        query = {"orderId": id}
+    order = await order_collection.find_one(query)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order["userId"] != userId:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return order
 
 # --- Payments ---
 
@@ -399,7 +558,7 @@ async def delete_payment_method(id: str, userId: str = Query(...)):
 @app.get("/outfits", response_model=List[OutfitModel])
 async def get_outfits(userId: str = Query(...)):
     outfits = await outfit_collection.find({"userId": userId}).sort("createdAt", -1).to_list(100)
-    return outfits
+    return list_response(await with_current_products(outfits, OUTFIT_ITEM_FIELDS), OutfitModel)
 
 @app.post("/outfits", response_model=OutfitModel)
 async def create_outfit(outfit_data: OutfitCreate, userId: str = Query(...)):
@@ -430,210 +589,280 @@ class RecommendationResponse(BaseModel):
     explanation: str
     style_tips: Optional[List[str]] = None
 
+class BatchRecommendRequest(BaseModel):
+    productIds: Optional[List[str]] = None
+    category: Optional[str] = None
+    occasions: List[str]
+    genders: List[str]
+    concurrency: int = 4
+    persist: bool = True
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+@app.get("/recommend/cache/stats")
+async def recommend_cache_stats():
+    return recommendation_cache.stats()
+
+@app.get("/recommend/stats")
+async def recommend_stats():
+    return {
+        "cache": recommendation_cache.stats(),
+        "coalescing": recommendation_flight.stats(),
+        "catalog": catalog.stats(),
+        "products": product_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "llmMemo": llm_memo.stats() if llm_memo else None
+    }
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: BatchRecommendRequest):
+    # Pre-generates outfits for product x occasion x gender; streams one NDJSON line per
+    # combination followed by a summary line
+    snapshot = await catalog.get()
+    job = PrecomputeJob(
+        build_recommendation,
+        store=precomputed_outfit_collection if request.persist else None,
+        catalog_version=snapshot.version,
+        concurrency=min(request.concurrency, BATCH_MAX_CONCURRENCY)
+    )
+    products = product_collection.find(product_query(request.productIds, request.category))
+
+    async def stream():
+        async for row in job.run(products, request.occasions, request.genders):
+            yield json.dumps(row) + "\n"
+        yield json.dumps({"summary": job.summary()}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/recommend", response_model=RecommendationResponse)
 async def recommend_outfit(request: RecommendRequest):
-    product = request.product
-    occasion = request.occasion
-    gender = request.gender
-    
-    category = map_category(product.get("category", ""))
-    
-    # 1. Identify candidate categories based on actual DB content
-    # DB Categories:
-    # Tops: "T-Shirt", "Formal Shirt", "shirt", "Kurta", "Short Kurta", "Kurta Shirt"
-    # Bottoms: "Jeans", "Chinos", "Joggers", "Formal Trousers"
-    # Outerwear: "Jacket", "Blazer", "Bandhgala", "Bandhgala Jacket"
-    # FullBody: "Sherwani", "Kurta Pajama", "Pathani Suit", "Dhoti Set", "Kurta Set", "Co-ords", "Suit", "Fusion Set", "Party Set"
-    
-    db_tops = ["T-Shirt", "Formal Shirt", "shirt", "Kurta", "Short Kurta", "Kurta Shirt"]
-    db_bottoms = ["Jeans", "Chinos", "Joggers", "Formal Trousers"]
-    db_outerwear = ["Jacket", "Blazer", "Bandhgala", "Bandhgala Jacket"]
-    
-    complementary_categories = []
-    
-    if category == "Tops":
-        complementary_categories = db_bottoms + db_outerwear
-    elif category == "Bottoms":
-        complementary_categories = db_tops + db_outerwear
-    elif category == "Outerwear":
-        complementary_categories = db_tops + db_bottoms
-    elif category == "FullBody":
-        # For sets, we can suggest outerwear or specific tops (like shirts for suits)
-        complementary_categories = db_outerwear + ["Formal Shirt"]
+    cache_key = recommendation_key(request.product, request.occasion, request.gender)
+    cached = await recommendation_cache.get(cache_key)
+    if cached is not None:
+        RECOMMEND_RESULTS.inc("cache")
+        return cached
+
+    # Identical concurrent requests share a single pipeline run
+    return await recommendation_flight.do(
+        cache_key,
+        lambda: compute_and_cache_recommendation(cache_key, request.product, request.occasion, request.gender)
+    )
+
+async def compute_and_cache_recommendation(cache_key: str, product: dict, occasion: str, gender: str):
+    generation = recommendation_cache.generation
+    # Outfits pre-generated by the batch job are served before running the pipeline
+    result = await load_precomputed_recommendation(cache_key)
+    cacheable = result is not None
+    if cacheable:
+        RECOMMEND_RESULTS.inc("precomputed")
     else:
-        # Default fallback
-        complementary_categories = db_tops + db_bottoms
-    
-    # 2. Fetch candidates from DB
-    candidate_query = {"category": {"$in": complementary_categories}}
-    
-    # Filter by gender if possible (simple heuristic)
-    if gender != "Unisex":
-        # This assumes products have a 'gender' field or we rely on the user to filter. 
-        # For now, we'll just fetch broadly to ensure we have candidates.
-        pass
+        result, cacheable = await build_recommendation(product, occasion, gender)
+    if cacheable:
+        await recommendation_cache.set(cache_key, result, generation)
+    return result
+
+async def load_precomputed_recommendation(cache_key: str) -> Optional[dict]:
+    doc = await precomputed_outfit_collection.find_one({"_id": cache_key})
+    if not doc:
+        return None
+    snapshot = await catalog.get()
+    if doc.get("catalogVersion") != snapshot.version:
+        return None
+    items = await hydrate_products(doc["itemIds"])
+    if len(items) < 2:
+        return None
+    return {"items": items, "explanation": doc["explanation"], "style_tips": doc.get("style_tips")}
+
+def memo_inputs(product: dict, occasion: str, gender: str) -> dict:
+    # Stored with each memoized reply so the popular ones can be replayed (precompute_outfits.py --popular)
+    product_id = product.get("_id") or product.get("id")
+    return {"productId": str(product_id) if product_id else None, "occasion": occasion, "gender": gender}
+
+async def build_recommendation(product: dict, occasion: str, gender: str):
+    # Returns (response, cacheable); rule-based fallbacks are not cached so the LLM path can recover
+    with span("recommend.candidates"):
+        snapshot = await catalog.get()
+        category = snapshot.taxonomy.slot_of(product.get("category", ""))
+
+        # 1. Candidates for the complementary slots come straight from the catalog snapshot,
+        #    pre-ranked locally so the LLM only sees the most compatible few
+        candidates = snapshot.rank_candidates(category, product, occasion, gender, RANKING_PREFILTER_K)
 
-    candidate_docs = await product_collection.find(candidate_query).limit(40).to_list(40)
-    
     # If no candidates found, fallback to existing logic (which fetches specific categories)
-    if not candidate_docs:
-        # Fallback logic
-        recommendations = []
-        if category == "Tops":
-            bottoms = await product_collection.find({"category": {"$in": db_bottoms}}).limit(3).to_list(3)
-            recommendations.extend(bottoms)
-        elif category == "Bottoms":
-            tops = await product_collection.find({"category": {"$in": db_tops}}).limit(3).to_list(3)
-            recommendations.extend(tops)
-        elif category == "Outerwear":
-            inner = await product_collection.find({"category": {"$in": db_tops}}).limit(2).to_list(2)
-            recommendations.extend(inner)
-        else:
-             # Try to find anything
-            others = await product_collection.find({"category": {"$in": db_tops + db_bottoms}}).limit(3).to_list(3)
-            recommendations.extend(others)
-            
-        return {"items": recommendations, "explanation": "Matched based on simple category rules (fallback).", "style_tips": ["Try mixing textures!", "Balance loose and tight fits."]}
+    if not candidates:
+        RECOMMEND_RESULTS.inc("fallback_no_candidates")
+        with span("recommend.fallback"):
+            recommendations = await hydrate_products([r.id for r in snapshot.fallback(category)])
+        return {"items": recommendations, "explanation": "Matched based on simple category rules (fallback).", "style_tips": ["Try mixing textures!", "Balance loose and tight fits."]}, False
 
-    # 3. Use Gemini to select best outfit
+    # 2. Use Gemini to select best outfit
     try:
-        candidate_list_str = json.dumps([
-            {
-                "id": str(p["_id"]),
-                "name": p["name"],
-                "category": p["category"],
-                "color": p.get("colors", ["Unknown"])[0] if p.get("colors") else "Unknown",
-                "price": p.get("price", 0)
-            } 
-            for p in candidate_docs
-        ])
-        
-        main_product_str = json.dumps({
-            "name": product.get("name"),
-            "category": product.get("category"),
-            "color": product.get("colors", ["Unknown"])[0] if product.get("colors") else "Unknown",
-            "description": product.get("description", "")
-        })
-        
-        prompt = f"""
-        You are a professional fashion stylist.
-        I have a main product: {main_product_str}
-        
-        I have a list of candidate products:
-        {candidate_list_str}
+        prompt_started = time.perf_counter()
+        # Compact candidate lines with short local ids, trimmed to the prompt token budget
+        prompt = build_stylist_prompt(product, candidates, occasion, gender)
+        record_span("recommend.prompt", time.perf_counter() - prompt_started)
         
-        Please select 3-4 items from the candidate list that form a complete, stylish outfit with the main product for a '{occasion}' occasion for {gender}.
-        The outfit must be color-coordinated and appropriate for the occasion.
-        
-        Return ONLY a valid JSON object with this structure:
-        {{
-            "selected_ids": ["id1", "id2", "id3"],
-            "style_tips": ["Tip 1", "Tip 2", "Tip 3"]
-        }}
-        Do not include any markdown formatting or explanations outside the JSON.
-        """
-        
-        if client:
-            response = client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            result = json.loads(text)
+        if llm_gateway.enabled and RECOMMEND_MODE == "llm":
+            source = "llm"
+            key = memo_key(llm_gateway.model, prompt.text) if llm_memo else None
+            memoized = await llm_memo.get(key) if llm_memo else None
+            try:
+                if memoized is not None:
+                    # Same model, same prompt: the stored selection (in local ids) stands in for the call
+                    source = "llm_memo"
+                    selected_ids, style_tips = prompt.resolve(memoized["selected_ids"]), memoized["style_tips"]
+                else:
+                    with span("recommend.llm"):
+                        response_text = await llm_gateway.generate(prompt.text, schema=STYLIST_RESPONSE_SCHEMA)
+                    reply = parse_stylist_reply(response_text, prompt)
+                    selected_ids, style_tips = reply.product_ids, reply.style_tips or ["Great look!"]
+                    if llm_memo:
+                        local_ids = {product_id: local_id for local_id, product_id in prompt.ids.items()}
+                        await llm_memo.set(
+                            key, {"selected_ids": [local_ids[i] for i in selected_ids], "style_tips": style_tips},
+                            llm_gateway.model, memo_inputs(product, occasion, gender)
+                        )
+            except StylistParseError as e:
+                # The round trip is already paid for and the candidates are ranked, so the local
+                # outfit beats the rule fallback; not cached, so the LLM gets another go
+                logger.warning(f"Unusable stylist reply, serving the ranked outfit: {e}")
+                source = "fallback_parse"
+                selected_ids = [c.id for c in snapshot.assemble_outfit(candidates)]
+                style_tips = ["Picked for colour, style and occasion match with your item."]
         else:
-             # Mock AI response if key is missing (fallback)
-             logger.warning("Gemini client not initialized. Using random selection.")
-             result = {
-                 "selected_ids": [str(c["_id"]) for c in random.sample(candidate_docs, min(3, len(candidate_docs)))],
-                 "style_tips": ["This is a randomly generated suggestion as API key is missing."]
-             }
-        
-        selected_ids = result.get("selected_ids", [])
-        style_tips = result.get("style_tips", ["Great look!"])
-        
-        selected_products = [
-            p for p in candidate_docs if str(p["_id"]) in selected_ids
-        ]
+             # No LLM (or RECOMMEND_MODE=local): take the top-ranked outfit directly
+             source = "local"
+             selected_ids = [c.id for c in snapshot.assemble_outfit(candidates)]
+             style_tips = ["Picked for colour, style and occasion match with your item."]
         
         # Ensure we have at least 2 items
-        if len(selected_products) < 2:
+        if len(selected_ids) < 2:
             raise Exception("AI selected too few items")
+        
+        with span("recommend.hydrate"):
+            selected_products = await hydrate_products(selected_ids)
+        RECOMMEND_RESULTS.inc(source)
             
         return {
             "items": selected_products, 
             "explanation": " ".join(style_tips),
             "style_tips": style_tips
-        }
+        }, source != "fallback_parse"
 
     except Exception as e:
         logger.error(f"Gemini error: {e}")
         # Fallback to simple logic if AI fails
-        recommendations = []
-        if category == "Tops":
-            bottoms = await product_collection.find({"category": {"$in": db_bottoms}}).limit(3).to_list(3)
-            recommendations.extend(bottoms)
-        elif category == "Bottoms":
-            tops = await product_collection.find({"category": {"$in": db_tops}}).limit(3).to_list(3)
-            recommendations.extend(tops)
-        elif category == "Outerwear":
-            inner = await product_collection.find({"category": {"$in": db_tops}}).limit(2).to_list(2)
-            recommendations.extend(inner)
-        else:
-             # Try to find anything
-            others = await product_collection.find({"category": {"$in": db_tops + db_bottoms}}).limit(3).to_list(3)
-            recommendations.extend(others)
+        RECOMMEND_RESULTS.inc("fallback_error")
+        with span("recommend.fallback"):
+            recommendations = await hydrate_products([r.id for r in snapshot.fallback(category)])
         
-        return {"items": recommendations, "explanation": "Matched based on style rules.", "style_tips": ["Classic combination."]}
+        return {"items": recommendations, "explanation": "Matched based on style rules.", "style_tips": ["Classic combination."]}, False
 
 # --- Seed Endpoint ---
 
+SEED_COLLECTIONS = {"products": product_collection, "collections": collection_collection, "users": user_collection}
+
+async def on_catalog_replaced():
+    # Catalog changed: bump the version stamp (reloads every worker's snapshot) and drop cached
+    # and pre-generated outfits
+    await catalog.bump_version()
+    await recommendation_cache.invalidate()
+    await precomputed_outfit_collection.delete_many({})
+
 @app.post("/seed")
 async def seed_database(seed_data: SeedRequest):
+    importer = SeedImporter(SEED_COLLECTIONS)
     # Clear existing data
-    await product_collection.delete_many({})
-    await user_collection.delete_many({})
-    await collection_collection.delete_many({})
-    
-    # Insert Users
-    if seed_data.users:
-        for user in seed_data.users:
-            if "password" in user:
-                 user["password"] = get_password_hash(user["password"])
-            
-            user["createdAt"] = datetime.now()
-            user["updatedAt"] = datetime.now()
-            await user_collection.insert_one(user)
-        
-    # Insert Products
-    if seed_data.products:
-        # Prepare products
-        products_to_insert = []
-        for product in seed_data.products:
-            p = product.copy()
-            if "_id" in p:
-                del p["_id"]
-            if "id" in p:
-                del p["id"]
-            
-            p["createdAt"] = datetime.now()
-            products_to_insert.append(p)
-            
-        if products_to_insert:
-            await product_collection.insert_many(products_to_insert)
-        
-    # Insert Collections
-    if seed_data.collections:
-        collections_to_insert = []
-        for collection in seed_data.collections:
-            c = collection.copy()
-            if "_id" in c:
-                del c["_id"]
-            if "id" in c:
-                del c["id"]
-            c["createdAt"] = datetime.now()
-            collections_to_insert.append(c)
-            
-        if collections_to_insert:
-            await collection_collection.insert_many(collections_to_insert)
+    await importer.reset()
+    await importer.import_records(records_from_seed(seed_data.dict()))
+    await on_catalog_replaced()
         
     return {"message": "Database seeded successfully"}
+
+@app.post("/seed/stream")
+async def seed_database_stream(request: Request, format: str = "ndjson", reset: bool = True, batchSize: int = SEED_BATCH_SIZE):
+    # Imports while the body is still arriving (NDJSON records tagged with "_kind"), so large
+    # catalogs never sit in memory; format=json accepts a SeedRequest-shaped body instead.
+    importer = SeedImporter(
+        SEED_COLLECTIONS,
+        batch_size=batchSize,
+        on_progress=lambda p: logger.info(f"Seed import progress: {p}"),
+        reset=reset
+    )
+
+    try:
+        if format == "json":
+            # Parsed and checked in full before anything is reset
+            seed = json.loads(await request.body())
+            if not isinstance(seed, dict):
+                raise ValueError("expected a JSON object with products, collections and users")
+            records = list(records_from_seed(seed))
+            if not all(isinstance(doc, dict) for _, doc in records):
+                raise ValueError("every seed record must be a JSON object")
+        else:
+            records = _ndjson_records(request.stream())
+        summary = await importer.import_records(records)
+    except ValueError as e:
+        # Reset happens before the first write, so a bad first batch never wiped anything
+        if importer.touched:
+            await on_catalog_replaced()
+        raise HTTPException(status_code=400, detail=f"Invalid seed data: {e}")
+
+    await on_catalog_replaced()
+    return {"message": "Database seeded successfully", **summary}
+
+async def _ndjson_records(chunks):
+    async for line in ndjson_lines(chunks):
+        record = record_from_line(line)
+        if record:
+            yield record
+
+# --- Lifecycle ---
+
+# Grace period for in-flight recommendation work on shutdown (uvicorn has already stopped
+# accepting requests and waited for open ones by then)
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "10"))
+
+# Cold-start mode for serverless (on by default on Vercel): startup makes no Mongo round trips.
+# Indexes are built in the background on first Mongo use (and can be applied at deploy time with
+# python indexes.py); the catalog snapshot and its sync start on first use. The Mongo and Gemini
+# clients are created on first use in either mode.
+LAZY_INIT = os.getenv("LAZY_INIT", "1" if os.getenv("VERCEL") else "0") == "1"
+
+# Registered at import rather than in startup(), which serverless runtimes may never run
+if LAZY_INIT:
+    on_first_use(prepare_indexes_deferred)
+
+async def startup():
+    if not LAZY_INIT:
+        await prepare_indexes()
+    await start_catalog()
+    await start_session_store()
+    await warm_llm_memo()
+
+async def shutdown():
+    # Reverse dependency order: background work first, the Mongo client last
+    await stop_catalog()
+    await recommendation_flight.drain(SHUTDOWN_DRAIN_SECONDS)
+    await flush_session_store()
+    await flush_llm_memo()
+    await stop_password_pool()
+    close_database()
+    logger.info("Shutdown complete")
+
+@app.get("/db/stats")
+async def db_stats():
+    return {"pool": pool_monitor.stats(), "catalogReadPreference": MONGO_CATALOG_READ_PREFERENCE}
+
+# Point-in-time values from the components' own stats(), read on each scrape
+register_gauge("mongo_pool_connections_open", "Open pooled Mongo connections", lambda: pool_monitor.stats()["open"])
+register_gauge("mongo_pool_connections_in_use", "Checked-out Mongo connections", lambda: pool_monitor.stats()["inUse"])
+register_gauge("mongo_pool_waiting", "Requests waiting for a Mongo connection", lambda: pool_monitor.stats()["waiting"])
+register_gauge("llm_in_flight", "LLM calls in progress", lambda: llm_gateway.in_flight)
+register_gauge("llm_waiting", "LLM calls waiting for a concurrency slot", lambda: llm_gateway.waiting)
+register_gauge("recommend_in_flight", "Distinct recommendation pipelines running", lambda: recommendation_flight.stats()["inFlight"])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
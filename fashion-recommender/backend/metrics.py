@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo.monitoring import CommandListener
+
+logger = logging.getLogger(__name__)
+
+# Request/DB/LLM instrumentation, served in Prometheus text format at GET /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Per-request trace spans: a Server-Timing response header plus one log line per request
+METRICS_TRACE = os.getenv("METRICS_TRACE", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+TOKEN_BUCKETS = (100, 200, 300, 400, 600, 800, 1200, 1600, 2400, 3200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple, **extra) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in [*zip(names, values), *extra.items()]]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le=_number(bound))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le='+Inf')} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(round(series[-1], 6))}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {series[-2]}")
+        return lines
+
+
+class Gauge:
+    # Read at scrape time from a callback (pool sizes, in-flight counts, ...)
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.error(f"Gauge {self.name} failed: {e}")
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_number(value)}"]
+
+
+# --- Registry ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")
+)
+HTTP_REQUEST_DB_COMMANDS = Histogram(
+    "http_request_db_commands", "Mongo round trips per request", ("route",), buckets=COUNT_BUCKETS
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency by originating route", ("route", "command"),
+    buckets=DB_LATENCY_BUCKETS
+)
+MONGO_COMMAND_FAILURES = Counter("mongo_command_failures_total", "Failed Mongo commands", ("command",))
+LLM_REQUESTS = Counter("llm_requests_total", "LLM gateway requests by outcome", ("backend", "outcome"))
+LLM_CALL_SECONDS = Histogram("llm_call_duration_seconds", "LLM backend call latency (excludes queueing)", ("backend",))
+LLM_QUEUE_SECONDS = Histogram("llm_queue_wait_seconds", "Time waiting for an LLM concurrency slot", ("backend",))
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens by direction (fake backend: estimated)", ("backend", "kind"))
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Estimated stylist prompt size in tokens", buckets=TOKEN_BUCKETS
+)
+LLM_REPLIES = Counter("llm_replies_total", "Stylist replies by parse outcome", ("outcome",))
+RECOMMEND_RESULTS = Counter("recommend_results_total", "Outfit recommendations by source", ("source",))
+SPAN_SECONDS = Histogram("span_duration_seconds", "Named in-request phases (e.g. recommend.llm)", ("span",))
+
+REGISTRY: List = [
+    HTTP_REQUEST_SECONDS, HTTP_REQUEST_DB_COMMANDS, MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES,
+    LLM_REQUESTS, LLM_CALL_SECONDS, LLM_QUEUE_SECONDS, LLM_TOKENS, LLM_PROMPT_TOKENS, LLM_REPLIES,
+    RECOMMEND_RESULTS, SPAN_SECONDS,
+]
+
+
+def register_gauge(name: str, help: str, read: Callable[[], float]):
+    REGISTRY.append(Gauge(name, help, read))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Request context ---
+
+class RequestTrace:
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.started = time.perf_counter()
+        self.db_commands = 0
+        self.db_seconds = 0.0
+        self.spans: List[Tuple[str, float]] = []
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; its path template keeps label
+        # cardinality bounded (no ids in labels)
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def server_timing(self) -> str:
+        parts = [f"{name.replace('.', '-')};dur={seconds * 1000:.1f}" for name, seconds in self.spans]
+        parts.append(f"db;dur={self.db_seconds * 1000:.1f};desc=\"{self.db_commands} commands\"")
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def record_span(name: str, seconds: float):
+    SPAN_SECONDS.observe(seconds, name)
+    trace = _trace.get()
+    if trace is not None and METRICS_TRACE:
+        trace.spans.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    # Plain ASGI (no BaseHTTPMiddleware) so streaming responses pass straight through
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace(scope)
+        token = _trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if METRICS_TRACE:
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"server-timing", trace.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            HTTP_REQUEST_SECONDS.observe(elapsed, trace.method, trace.route, str(status))
+            HTTP_REQUEST_DB_COMMANDS.observe(trace.db_commands, trace.route)
+            if METRICS_TRACE:
+                logger.info("trace " + json.dumps({
+                    "method": trace.method, "route": trace.route, "path": trace.path, "status": status,
+                    "ms": round(elapsed * 1000, 1), "dbCommands": trace.db_commands,
+                    "dbMs": round(trace.db_seconds * 1000, 1),
+                    "spans": {name: round(seconds * 1000, 1) for name, seconds in trace.spans},
+                }))
+
+
+class CommandMonitor(CommandListener):
+    # Driver command events; Motor runs each operation in a copy of the caller's context,
+    # so the request trace is visible here even though events fire on executor threads.
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        MONGO_COMMAND_FAILURES.inc(event.command_name)
+        self._finished(event)
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        trace = _trace.get()
+        MONGO_COMMAND_SECONDS.observe(seconds, trace.route if trace else "background", event.command_name)
+        if trace is not None:
+            trace.db_commands += 1
+            trace.db_seconds += seconds
+
+
+command_monitor = CommandMonitor()
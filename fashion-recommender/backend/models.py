@@ -33,6 +33,11 @@ class ProductModel(BaseModel):
             }
         }
 
+class ProductPage(BaseModel):
+    # Projected product documents (see PRODUCT_VIEWS in main) plus the keyset cursor for the next page
+    items: List[dict]
+    nextCursor: Optional[str] = None
+
 class CartItemModel(BaseModel):
     productId: str
     name: Optional[str] = None
@@ -124,6 +129,28 @@ class OrderCreate(BaseModel):
     total: float
     shippingAddress: ShippingAddress
 
+class OrderPreviewItem(BaseModel):
+    productId: Optional[str] = None
+    name: Optional[str] = None
+    image: Optional[str] = None
+
+class OrderSummaryModel(BaseModel):
+    # Row of the order history list (order_summaries read model)
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    orderId: Optional[str] = None
+    status: Optional[str] = None
+    total: Optional[float] = None
+    createdAt: Optional[datetime] = None
+    itemCount: int = 0
+    preview: List[OrderPreviewItem] = []
+
+    class Config:
+        populate_by_name = True
+
+class OrderSummaryPage(BaseModel):
+    items: List[OrderSummaryModel]
+    nextCursor: Optional[str] = None
+
 class CollectionModel(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     name: str
@@ -0,0 +1,60 @@
+import json
+import asyncio
+import logging
+
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+# Thumbnails shown per order in the order history list
+ORDER_SUMMARY_PREVIEW_ITEMS = 3
+# Orders-by-user read model: one small document per order (no line items, no address),
+# same _id as the order, listed newest first with keyset pagination
+ORDER_SUMMARY_SORT = [("createdAt", -1), ("_id", -1)]
+
+
+def order_summary(order: dict) -> dict:
+    items = order.get("items") or []
+    return {
+        "_id": order["_id"],
+        "userId": order["userId"],
+        "orderId": order.get("orderId"),
+        "status": order.get("status"),
+        "total": order.get("total"),
+        "createdAt": order.get("createdAt"),
+        "itemCount": len(items),
+        "preview": [
+            {"productId": i.get("productId"), "name": i.get("name"), "image": i.get("image")}
+            for i in items[:ORDER_SUMMARY_PREVIEW_ITEMS]
+        ],
+    }
+
+
+async def rebuild_order_summaries(orders, summaries, batch_size: int = 1000) -> int:
+    # Backfill / repair: upsert a summary for every order
+    written = 0
+    batch = []
+    async for order in orders.find({}):
+        batch.append(ReplaceOne({"_id": order["_id"]}, order_summary(order), upsert=True))
+        if len(batch) >= batch_size:
+            await summaries.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await summaries.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+# --- CLI ---
+#
+#   python order_summaries.py      rebuild order_summaries from orders (run once after deploying)
+
+async def _main():
+    from database import order_collection, order_summary_collection
+    written = await rebuild_order_summaries(order_collection, order_summary_collection)
+    print(json.dumps({"summaries": written}))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
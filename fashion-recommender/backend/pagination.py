@@ -0,0 +1,75 @@
+import json
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Keyset pagination: the sort spec always ends in _id so every position is unique and stable.
+SortSpec = List[Tuple[str, int]]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"o": str(value)}
+    return {"v": value}
+
+
+# Values a cursor may carry besides datetimes and ObjectIds. Anything else (a dict especially)
+# would land in the keyset filter as-is, letting a crafted cursor inject query operators.
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _decode_value(raw: dict):
+    if not isinstance(raw, dict) or len(raw) != 1:
+        raise InvalidCursor("unexpected value encoding")
+    if "d" in raw:
+        return datetime.fromisoformat(raw["d"])
+    if "o" in raw:
+        return ObjectId(raw["o"])
+    value = raw["v"]
+    if not isinstance(value, _SCALARS):
+        raise InvalidCursor(f"unsupported value type {type(value).__name__}")
+    return value
+
+
+def encode_cursor(doc: dict, sort: SortSpec) -> str:
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = [_decode_value(v) for v in json.loads(base64.urlsafe_b64decode(padded))]
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if len(values) != len(sort):
+        raise InvalidCursor("Cursor does not match the requested sort")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: list) -> dict:
+    # (a, b, _id) > (va, vb, vid) in sort order, expanded into the usual $or of prefixes:
+    #   a > va  OR  (a == va AND b > vb)  OR  (a == va AND b == vb AND _id > vid)
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def apply_cursor(query: dict, sort: SortSpec, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return query
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [query, after]} if query else after
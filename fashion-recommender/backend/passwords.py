@@ -0,0 +1,87 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor for new hashes (existing hashes keep the cost they were made with)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads scale across cores; "process" is there for interpreters where it doesn't
+PASSWORD_POOL_KIND = os.getenv("PASSWORD_POOL_KIND", "thread")
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(os.cpu_count() or 2)))
+# Hash/verify jobs allowed to queue behind the pool before callers get a 503
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+
+
+class PasswordPoolSaturated(Exception):
+    pass
+
+
+# Module-level so they can be pickled into a process pool
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordHasher:
+    def __init__(self, kind: str = PASSWORD_POOL_KIND, size: int = PASSWORD_POOL_SIZE,
+                 max_pending: int = PASSWORD_POOL_MAX_PENDING, rounds: int = BCRYPT_ROUNDS):
+        self.kind = kind
+        self.size = size
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so importing the app doesn't spawn workers
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.size)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(check_password, plain_password, hashed_password)
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordPoolSaturated(f"{self.pending} password operations already queued")
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "size": self.size,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "maxPending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
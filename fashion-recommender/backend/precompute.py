@@ -0,0 +1,146 @@
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from bson import ObjectId
+
+from recommend_cache import recommendation_key
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def product_query(product_ids: Optional[List[str]] = None, category: Optional[str] = None) -> dict:
+    query = {}
+    if product_ids:
+        query["_id"] = {"$in": [ObjectId(i) if ObjectId.is_valid(i) else i for i in product_ids]}
+    if category:
+        query["category"] = category
+    return query
+
+
+class PrecomputeJob:
+    # Runs the /recommend pipeline for product x occasion x gender with bounded concurrency,
+    # yielding one result row per combination as soon as it finishes.
+    def __init__(self, build: Callable[[dict, str, str], Awaitable[tuple]], store=None,
+                 catalog_version: Optional[int] = None, concurrency: int = 4):
+        self.build = build
+        self.store = store
+        self.catalog_version = catalog_version
+        self.concurrency = max(1, concurrency)
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.persisted = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def run(self, products, occasions: List[str], genders: List[str]) -> AsyncIterator[dict]:
+        return self.run_combinations(_combinations(products, occasions, genders))
+
+    async def run_combinations(self, combinations) -> AsyncIterator[dict]:
+        # `combinations`: (product, occasion, gender) tuples, sync or async iterable
+        self.started_at = time.perf_counter()
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            # The sentinels go out even if the product cursor fails, so the workers always finish;
+            # the error is re-raised once they have
+            try:
+                async for combination in _aiter(combinations):
+                    await jobs.put(combination)
+            finally:
+                for _ in range(self.concurrency):
+                    await jobs.put(_DONE)
+
+        async def work():
+            try:
+                while True:
+                    job = await jobs.get()
+                    if job is _DONE:
+                        return
+                    await results.put(await self._run_one(*job))
+            finally:
+                await results.put(_DONE)
+
+        tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        try:
+            finished_workers = 0
+            while finished_workers < self.concurrency:
+                row = await results.get()
+                if row is _DONE:
+                    finished_workers += 1
+                    continue
+                yield row
+            # Surface producer errors (e.g. the product cursor failing)
+            await tasks[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.finished_at = time.perf_counter()
+
+    async def _run_one(self, product: dict, occasion: str, gender: str) -> dict:
+        self.total += 1
+        key = recommendation_key(product, occasion, gender)
+        row = {"key": key, "productId": str(product.get("_id")), "occasion": occasion, "gender": gender}
+        try:
+            result, cacheable = await self.build(product, occasion, gender)
+            item_ids = [str(item["_id"]) for item in result["items"]]
+            # Rule-based fallbacks are returned but not persisted, same as the response cache
+            if self.store is not None and cacheable:
+                await self.store.replace_one({"_id": key}, {
+                    "_id": key,
+                    "productId": row["productId"],
+                    "occasion": occasion,
+                    "gender": gender,
+                    "itemIds": item_ids,
+                    "explanation": result["explanation"],
+                    "style_tips": result.get("style_tips"),
+                    "catalogVersion": self.catalog_version,
+                    "createdAt": datetime.now()
+                }, upsert=True)
+                self.persisted += 1
+        except Exception as e:
+            # Build or persist failure: one failed row, the job carries on
+            self.failed += 1
+            logger.error(f"Precompute failed for {key}: {e}")
+            return {**row, "ok": False, "error": str(e)}
+
+        self.succeeded += 1
+        row.update({
+            "ok": True, "itemIds": item_ids, "explanation": result["explanation"],
+            "style_tips": result.get("style_tips"), "persisted": self.store is not None and cacheable
+        })
+        return row
+
+    def summary(self) -> dict:
+        end = self.finished_at or time.perf_counter()
+        seconds = end - self.started_at if self.started_at else 0.0
+        return {
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "persisted": self.persisted,
+            "seconds": round(seconds, 3),
+            "itemsPerSec": round(self.total / seconds, 2) if seconds else 0.0,
+        }
+
+
+async def _combinations(products, occasions: List[str], genders: List[str]):
+    async for product in _aiter(products):
+        for occasion in occasions:
+            for gender in genders:
+                yield product, occasion, gender
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,85 @@
+import sys
+import json
+import asyncio
+import argparse
+
+from main import build_recommendation, catalog, llm_memo
+from database import product_collection, precomputed_outfit_collection
+from precompute import PrecomputeJob, product_query
+
+# Pre-generates outfits for the catalog and stores them in precomputed_outfits.
+# Result rows are written as NDJSON; progress and throughput go to stderr.
+#
+#   python precompute_outfits.py --occasions Party,Casual,Wedding --genders Men,Women --concurrency 8
+#   python precompute_outfits.py --category Jeans --occasions Casual --genders Men --out jeans.ndjson
+#
+# --popular replays the most requested product/occasion/gender combinations recorded in the
+# LLM memo instead, e.g. right after a deploy or catalog change:
+#
+#   python precompute_outfits.py --popular 500
+
+
+def split(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+async def popular_combinations(limit: int):
+    if llm_memo is None:
+        raise SystemExit("--popular needs the LLM memo (LLM_MEMO_ENABLED=1)")
+    # One combination can have several memoized prompts (e.g. before and after a catalog change)
+    inputs = list({(i["productId"], i["occasion"], i["gender"]): i for i in await llm_memo.popular_inputs(limit)}.values())
+    if not inputs:
+        return []
+    products = {
+        str(p["_id"]): p
+        async for p in product_collection.find(product_query(list({i["productId"] for i in inputs})))
+    }
+    # Products deleted since the reply was memoized are skipped
+    return [(products[i["productId"]], i["occasion"], i["gender"]) for i in inputs if i["productId"] in products]
+
+
+async def run(args):
+    snapshot = await catalog.get()
+    job = PrecomputeJob(
+        build_recommendation,
+        store=None if args.dry_run else precomputed_outfit_collection,
+        catalog_version=snapshot.version,
+        concurrency=args.concurrency
+    )
+    if args.popular:
+        rows = job.run_combinations(await popular_combinations(args.popular))
+    else:
+        products = product_collection.find(product_query(split(args.products) if args.products else None, args.category))
+        rows = job.run(products, split(args.occasions), split(args.genders))
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        async for row in rows:
+            out.write(json.dumps(row) + "\n")
+            done = job.succeeded + job.failed
+            if done % args.progress_every == 0:
+                summary = job.summary()
+                print(f"{done} done, {summary['failed']} failed, {summary['itemsPerSec']} items/sec", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary = job.summary()
+    print(json.dumps({"summary": summary}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate outfits for product x occasion x gender")
+    parser.add_argument("--products", help="Comma-separated product ids (default: whole catalog)")
+    parser.add_argument("--category", help="Only products in this category")
+    parser.add_argument("--occasions", help="Comma-separated occasions")
+    parser.add_argument("--genders", help="Comma-separated genders")
+    parser.add_argument("--popular", type=int, help="Replay the N most-hit combinations from the LLM memo instead")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--out", help="Write NDJSON results to this file instead of stdout")
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Don't persist results")
+    args = parser.parse_args()
+    if not args.popular and not (args.occasions and args.genders):
+        parser.error("--occasions and --genders are required unless --popular is given")
+    asyncio.run(run(args))
@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300"))
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "5000"))
+
+_MISSING = object()
+
+
+class ProductCache:
+    # Product documents by id (TTL + LRU). Misses are batched DataLoader-style: every id
+    # requested during the same event-loop tick, from any request, is fetched with a single
+    # $in query. Unknown ids are cached too, so junk ids in a wishlist don't hit Mongo per view.
+    #
+    # Cached documents are shared between requests; callers must not mutate them.
+    def __init__(self, collection, ttl: float = PRODUCT_CACHE_TTL_SECONDS, max_entries: int = PRODUCT_CACHE_MAX_ENTRIES):
+        self.collection = collection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # id -> [expires_at, doc or None, validated model or None]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._dispatch_scheduled = False
+        self._dispatch_tasks = set()
+        # Bumped by invalidate() so a batch that was in flight doesn't re-cache stale documents
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    def _lookup(self, product_id: str):
+        entry = self._entries.get(product_id)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= time.monotonic():
+            del self._entries[product_id]
+            return _MISSING
+        self._entries.move_to_end(product_id)
+        return entry
+
+    async def get_many(self, product_ids: Iterable[str]) -> Dict[str, dict]:
+        # id -> document for every id that exists
+        found, waiting = {}, {}
+        for product_id in dict.fromkeys(str(i) for i in product_ids):
+            entry = self._lookup(product_id)
+            if entry is _MISSING:
+                self.misses += 1
+                waiting[product_id] = self._load(product_id)
+            else:
+                self.hits += 1
+                if entry[1] is not None:
+                    found[product_id] = entry[1]
+        if waiting:
+            for product_id, doc in zip(waiting, await asyncio.gather(*waiting.values())):
+                if doc is not None:
+                    found[product_id] = doc
+        return found
+
+    async def get(self, product_id: str) -> Optional[dict]:
+        return (await self.get_many([product_id])).get(str(product_id))
+
+    async def get_ordered(self, product_ids: List[str]) -> List[dict]:
+        # Documents in the given order, unknown ids dropped
+        found = await self.get_many(product_ids)
+        return [found[str(i)] for i in product_ids if str(i) in found]
+
+    async def get_models(self, product_ids: List[str], model_class) -> list:
+        # Validated models, memoized alongside the document so a response model holding
+        # them (e.g. WishlistResponse) doesn't re-validate every product on every view
+        found = await self.get_many(product_ids)
+        models = []
+        for product_id in product_ids:
+            product_id = str(product_id)
+            if product_id not in found:
+                continue
+            entry = self._entries.get(product_id)
+            model = entry[2] if entry is not None and entry[1] is found[product_id] else None
+            if model is None:
+                model = model_class.model_validate(found[product_id])
+                if entry is not None and entry[1] is found[product_id]:
+                    entry[2] = model
+            models.append(model)
+        return models
+
+    def _load(self, product_id: str) -> asyncio.Future:
+        future = self._pending.get(product_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[product_id] = future
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                # Runs after everything already queued on the loop, so concurrent callers join the batch
+                asyncio.get_running_loop().call_soon(self._start_dispatch)
+        return future
+
+    def _start_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        # The loop only holds weak references to tasks
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self):
+        batch, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+        if not batch:
+            return
+        self.batches += 1
+        generation = self._generation
+        ids = [ObjectId(i) if ObjectId.is_valid(i) else i for i in batch]
+        try:
+            docs = await self.collection.find({"_id": {"$in": ids}}).to_list(len(ids))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_id = {str(d["_id"]): d for d in docs}
+        expires_at = time.monotonic() + self.ttl
+        for product_id, future in batch.items():
+            doc = by_id.get(product_id)
+            if generation == self._generation:
+                self._entries[product_id] = [expires_at, doc, None]
+                self._entries.move_to_end(product_id)
+            if not future.done():
+                future.set_result(doc)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def evict(self, product_ids: Iterable[str]):
+        # Targeted invalidation for changes the catalog snapshot doesn't track (stock). A batch
+        # in flight may hold the old documents, so it is kept from caching them as well.
+        self._generation += 1
+        for product_id in product_ids:
+            self._entries.pop(str(product_id), None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "batches": self.batches,
+        }
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import logging
+from typing import Dict, List, NamedTuple, Sequence
+
+from metrics import LLM_PROMPT_TOKENS, LLM_REPLIES
+
+logger = logging.getLogger(__name__)
+
+# Input-token budget for the stylist prompt; lower-ranked candidates are dropped to fit
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "800"))
+# Never go below this many candidates, even over budget (an outfit needs a few to choose from)
+PROMPT_MIN_CANDIDATES = 4
+# A reply needs at least this many valid candidate ids to make an outfit
+STYLIST_MIN_ITEMS = 2
+PROMPT_NAME_CHARS = 48
+PROMPT_DESCRIPTION_CHARS = 160
+# Rough English/JSON average; good enough for budgeting without shipping a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Identical on every call, so it comes first: providers that cache prompt prefixes reuse it
+STYLIST_INSTRUCTIONS = (
+    "You are a professional fashion stylist. From the candidates, pick 3-4 items that form a complete, "
+    "colour-coordinated outfit with the main item and suit the occasion.\n"
+    "Candidates are one per line as id|name|category|color|price; category and color are numbers "
+    "from the Categories and Colors lists.\n"
+    'Return ONLY a JSON object: {"selected_ids": ["<candidate id>", ...], "style_tips": ["<tip>", "<tip>", "<tip>"]}. '
+    "No markdown and no text outside the JSON.\n"
+)
+
+# Response schema for structured output (Gemini's OpenAPI subset); the parser below still
+# copes with free text, for backends or models that ignore it
+STYLIST_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "selected_ids": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "style_tips": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["selected_ids", "style_tips"],
+}
+
+_FENCE_RE = re.compile(r"```(?:json)?", re.I)
+_IDS_RE = re.compile(r'"selected_ids"\s*:\s*\[([^\]]*)')
+_TIPS_RE = re.compile(r'"style_tips"\s*:\s*\[([^\]]*)')
+_STRING_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_ID_TOKEN_RE = re.compile(r'"([^"]*)"|(\d+)')
+
+
+class StylistParseError(ValueError):
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(text: str, limit: int) -> str:
+    # Keeps the field separator out of free text, too
+    text = " ".join(str(text or "").replace("|", "/").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class StylistPrompt(NamedTuple):
+    text: str
+    # Short local id in the prompt -> product id
+    ids: Dict[str, str]
+    tokens: int
+    candidates: int
+    dropped: int
+
+    def resolve(self, local_ids: Sequence) -> List[str]:
+        # Model output back to product ids; unknown ids are ignored, order and uniqueness kept
+        resolved = []
+        for local_id in local_ids:
+            product_id = self.ids.get(str(local_id).strip())
+            if product_id and product_id not in resolved:
+                resolved.append(product_id)
+        return resolved
+
+
+def build_stylist_prompt(product: dict, candidates: Sequence, occasion: str, gender: str,
+                         budget: int = PROMPT_TOKEN_BUDGET) -> StylistPrompt:
+    # `candidates` are catalog ProductRecords, best first; the budget keeps a prefix of them
+    colors = product.get("colors")
+    header = (
+        f"{STYLIST_INSTRUCTIONS}\n"
+        f"Main item: {_clip(product.get('name'), PROMPT_NAME_CHARS)} | {_clip(product.get('category'), 32)} | "
+        f"{_clip(colors[0] if colors else 'Unknown', 24)} | {_clip(product.get('description'), PROMPT_DESCRIPTION_CHARS)}\n"
+        f"Occasion: {_clip(occasion, 32)}. For: {_clip(gender, 16)}.\n"
+    )
+
+    categories: Dict[str, int] = {}
+    palette: Dict[str, int] = {}
+    lines, ids = [], {}
+    used = estimate_tokens(header) + 40  # the vocab lines and column header
+    for c in candidates:
+        category = categories.get(c.category)
+        color = palette.get(c.color)
+        line = (
+            f"{len(lines) + 1}|{_clip(c.name, PROMPT_NAME_CHARS)}|"
+            f"{len(categories) if category is None else category}|{len(palette) if color is None else color}|"
+            f"{round(c.price)}"
+        )
+        # New vocab entries cost a few tokens as well
+        cost = estimate_tokens(line) + 1 + (category is None) * 3 + (color is None) * 2
+        if used + cost > budget and len(lines) >= PROMPT_MIN_CANDIDATES:
+            break
+        if category is None:
+            categories[c.category] = len(categories)
+        if color is None:
+            palette[c.color] = len(palette)
+        used += cost
+        lines.append(line)
+        ids[str(len(lines))] = c.id
+
+    text = (
+        header
+        + "Categories: " + "; ".join(f"{i} {_clip(name, 32)}" for name, i in categories.items()) + "\n"
+        + "Colors: " + "; ".join(f"{i} {_clip(name, 24)}" for name, i in palette.items()) + "\n"
+        + "Candidates (id|name|category|color|price):\n"
+        + "\n".join(lines) + "\n"
+    )
+    prompt = StylistPrompt(text, ids, estimate_tokens(text), len(lines), len(candidates) - len(lines))
+    LLM_PROMPT_TOKENS.observe(prompt.tokens)
+    logger.info(
+        f"Stylist prompt: ~{prompt.tokens} tokens ({len(text)} chars), "
+        f"{prompt.candidates} candidates, {prompt.dropped} dropped for the {budget}-token budget"
+    )
+    return prompt
+
+
+class StylistReply(NamedTuple):
+    product_ids: List[str]
+    style_tips: List[str]
+    # Recovered from malformed or truncated JSON
+    salvaged: bool
+
+
+def _unescape(text: str) -> str:
+    try:
+        return json.loads(f'"{text}"')
+    except ValueError:
+        return text
+
+
+def parse_stylist_reply(text: str, prompt: StylistPrompt) -> StylistReply:
+    # Model output -> product ids (validated against the prompt's id map) and tips
+    body = _FENCE_RE.sub("", text or "").strip()
+    salvaged = False
+    try:
+        data = json.loads(body[body.find("{"):body.rfind("}") + 1])
+        if not isinstance(data, dict):
+            raise ValueError("reply is not an object")
+        ids, tips = data.get("selected_ids") or [], data.get("style_tips") or []
+    except ValueError:
+        # Chatty or cut-off output: pull the two arrays out by pattern
+        match = _IDS_RE.search(body)
+        if match is None:
+            LLM_REPLIES.inc("failed")
+            raise StylistParseError(f"Unparseable stylist reply: {body[:80]!r}")
+        ids = [quoted or number for quoted, number in _ID_TOKEN_RE.findall(match.group(1))]
+        tips_match = _TIPS_RE.search(body)
+        tips = [_unescape(t) for t in _STRING_RE.findall(tips_match.group(1))] if tips_match else []
+        salvaged = True
+
+    product_ids = prompt.resolve(ids if isinstance(ids, list) else [ids])
+    if len(product_ids) < STYLIST_MIN_ITEMS:
+        LLM_REPLIES.inc("invalid_ids")
+        raise StylistParseError(f"Stylist reply has {len(product_ids)} valid candidate ids")
+    tips = [t.strip() for t in (tips if isinstance(tips, list) else [tips]) if isinstance(t, str) and t.strip()]
+    LLM_REPLIES.inc("salvaged" if salvaged else "ok")
+    return StylistReply(product_ids, tips, salvaged)
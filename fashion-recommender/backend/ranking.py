@@ -0,0 +1,189 @@
+import os
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tokenizer import tokenize
+
+# Hashed feature space for product embeddings
+RANKING_DIM = int(os.getenv("RANKING_DIM", "64"))
+# Weight of the occasion/gender match relative to similarity with the hero product
+RANKING_OCCASION_WEIGHT = float(os.getenv("RANKING_OCCASION_WEIGHT", "0.6"))
+
+FEATURE_WEIGHTS = {
+    "cat": 1.0,
+    "color": 1.5,
+    "tag": 1.2,
+    "style": 1.2,
+    "price": 0.8,
+    "word": 0.4,
+}
+PRICE_BANDS = [25, 50, 100, 200, 400]
+
+
+def price_band(price) -> Optional[int]:
+    # None for a price that isn't a number (e.g. "$20"): the product just gets no price feature
+    try:
+        price = float(price or 0)
+    except (TypeError, ValueError):
+        return None
+    for band, limit in enumerate(PRICE_BANDS):
+        if price < limit:
+            return band
+    return len(PRICE_BANDS)
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int):
+    # crc32 rather than hash() so vectors are stable across processes
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class FeatureEncoder:
+    def __init__(self, dim: int = RANKING_DIM):
+        self.dim = dim
+
+    def _features(self, doc: dict):
+        if doc.get("category"):
+            yield "cat", doc["category"].lower()
+        for color in doc.get("colors") or []:
+            yield "color", str(color).lower()
+        for tag in doc.get("tags") or []:
+            yield "tag", str(tag).lower()
+        for token in tokenize(doc.get("style")):
+            yield "style", token
+        band = price_band(doc["price"]) if doc.get("price") is not None else None
+        if band is not None:
+            yield "price", str(band)
+        for word in set(tokenize(doc.get("name")) + tokenize(doc.get("description"))):
+            yield "word", word
+
+    def _vector(self, features) -> np.ndarray:
+        indexes, weights = [], []
+        for kind, value in features:
+            index, sign = _bucket(f"{kind}:{value}", self.dim)
+            indexes.append(index)
+            weights.append(sign * FEATURE_WEIGHTS[kind])
+        if not indexes:
+            return np.zeros(self.dim, dtype=np.float32)
+        vec = np.bincount(indexes, weights=weights, minlength=self.dim).astype(np.float32)
+        return _normalize(vec)
+
+    def encode(self, doc: dict) -> np.ndarray:
+        return self._vector(self._features(doc))
+
+    def encode_many(self, docs: List[dict]) -> np.ndarray:
+        # One bincount over the whole batch instead of a numpy call per product
+        flat_indexes, weights = [], []
+        for row, doc in enumerate(docs):
+            offset = row * self.dim
+            for kind, value in self._features(doc):
+                index, sign = _bucket(f"{kind}:{value}", self.dim)
+                flat_indexes.append(offset + index)
+                weights.append(sign * FEATURE_WEIGHTS[kind])
+        matrix = np.bincount(flat_indexes, weights=weights, minlength=len(docs) * self.dim)
+        matrix = matrix.astype(np.float32).reshape(len(docs), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def encode_context(self, occasion: str, gender: str) -> np.ndarray:
+        # Occasion words are matched against tags, style and description vocabulary
+        return self._vector(
+            (kind, token)
+            for token in tokenize(occasion) + tokenize(gender)
+            for kind in ("tag", "style", "word")
+        )
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+class VectorIndex:
+    # Contiguous float32 matrix with one row per product; rows are reused after deletes
+    def __init__(self, dim: int = RANKING_DIM, capacity: int = 1024):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.row_by_id: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._next_row = 0
+
+    def set(self, product_id: str, vec: np.ndarray):
+        row = self.row_by_id.get(product_id)
+        if row is None:
+            row = self._allocate()
+            self.row_by_id[product_id] = row
+        self.matrix[row] = vec
+
+    def load(self, product_ids: List[str], matrix: np.ndarray):
+        # Bulk fill for a fresh index
+        for product_id in product_ids:
+            self.row_by_id[product_id] = self._allocate()
+        rows = [self.row_by_id[i] for i in product_ids]
+        self.matrix[rows] = matrix
+
+    def remove(self, product_id: str):
+        row = self.row_by_id.pop(product_id, None)
+        if row is not None:
+            self.matrix[row] = 0
+            self._free_rows.append(row)
+
+    def _allocate(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        if self._next_row == len(self.matrix):
+            grown = np.zeros((len(self.matrix) * 2, self.dim), dtype=np.float32)
+            grown[:self._next_row] = self.matrix
+            self.matrix = grown
+        row = self._next_row
+        self._next_row += 1
+        return row
+
+    def gather(self, product_ids: List[str]) -> np.ndarray:
+        rows = np.fromiter((self.row_by_id[i] for i in product_ids), dtype=np.intp, count=len(product_ids))
+        return np.ascontiguousarray(self.matrix[rows])
+
+
+def score(matrix: np.ndarray, hero: np.ndarray, context: Optional[np.ndarray] = None,
+          occasion_weight: float = RANKING_OCCASION_WEIGHT) -> np.ndarray:
+    # Rows are unit length, so a single mat-vec gives the blended cosine score
+    query = hero if context is None else hero + occasion_weight * context
+    return matrix @ query
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    best = np.argpartition(-scores, k)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def assemble_outfit(ranked: list, slot_of, size: int = 3) -> list:
+    # Best item per slot first so the outfit covers every complementary slot, then fill by score
+    outfit, seen_slots, seen_categories = [], set(), set()
+    for record in ranked:
+        slot = slot_of(record.category)
+        if slot not in seen_slots:
+            outfit.append(record)
+            seen_slots.add(slot)
+            seen_categories.add(record.category)
+    outfit = outfit[:size]
+    for record in ranked:
+        if len(outfit) >= size:
+            break
+        if record not in outfit and record.category not in seen_categories:
+            outfit.append(record)
+            seen_categories.add(record.category)
+    for record in ranked:
+        if len(outfit) >= size:
+            break
+        if record not in outfit:
+            outfit.append(record)
+    return outfit
@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_CACHE_TTL_SECONDS = float(os.getenv("RECOMMEND_CACHE_TTL_SECONDS", "600"))
+RECOMMEND_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMEND_CACHE_MAX_ENTRIES", "1024"))
+# Set to "mongo" to share entries between workers through the recommendation_cache collection
+RECOMMEND_CACHE_SHARED = os.getenv("RECOMMEND_CACHE_SHARED", "")
+
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+def recommendation_key(product: dict, occasion: str, gender: str) -> str:
+    product_id = product.get("_id") or product.get("id")
+    if product_id:
+        product_part = f"id:{product_id}"
+    else:
+        # Ad-hoc products (no id) are keyed by what the pipeline actually reads
+        product_part = f"p:{_norm(product.get('name'))}/{_norm(product.get('category'))}"
+    return f"{product_part}|{_norm(occasion)}|{_norm(gender)}"
+
+
+class MongoCacheBackend:
+    # Shared L2 store; expired documents are reaped by the TTL index on expiresAt (see indexes.py)
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, key: str) -> Optional[dict]:
+        doc = await self.collection.find_one({"_id": key, "expiresAt": {"$gt": datetime.now()}})
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: dict, ttl: float):
+        await self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "expiresAt": datetime.now() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+    async def clear(self):
+        await self.collection.delete_many({})
+
+
+class RecommendationCache:
+    def __init__(self, ttl: float = RECOMMEND_CACHE_TTL_SECONDS, max_entries: int = RECOMMEND_CACHE_MAX_ENTRIES, shared=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so results computed against an older catalog are dropped
+        self.generation = 0
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        if self.shared:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                logger.error(f"Shared recommendation cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.shared_hits += 1
+                self._store(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self._store(key, value)
+        if self.shared:
+            try:
+                await self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.error(f"Shared recommendation cache write failed: {e}")
+
+    def _store(self, key: str, value: dict):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def invalidate(self, shared: bool = True):
+        # Called whenever the product catalog changes. Workers that merely observe a change
+        # pass shared=False; the writer has already cleared the shared tier.
+        self._entries.clear()
+        self.invalidations += 1
+        self.generation += 1
+        if self.shared and shared:
+            await self.shared.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "sharedHits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hitRate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_cache_from_env(shared_collection=None) -> RecommendationCache:
+    shared = None
+    if RECOMMEND_CACHE_SHARED == "mongo" and shared_collection is not None:
+        shared = MongoCacheBackend(shared_collection)
+    return RecommendationCache(shared=shared)
@@ -0,0 +1,204 @@
+import os
+import math
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Container, Dict, List, Optional, Tuple
+
+from tokenizer import tokenize
+
+# Matches in the name count most; description words are a weak signal
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "brand": 2.0, "tags": 2.0, "category": 1.5, "description": 1.0}
+# Cap on vocabulary terms a prefix may expand to ("s" would otherwise match half the index)
+SEARCH_MAX_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", "64"))
+# Prefix-only matches score a bit below whole-word matches
+PREFIX_MATCH_FACTOR = 0.7
+# Removed docs stay as tombstones until there are this many (or a quarter of the index)
+SEARCH_COMPACT_MIN_TOMBSTONES = 1024
+
+
+def _field_text(doc: dict, field: str) -> str:
+    value = doc.get(field)
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return value or ""
+
+
+def is_searchable(query: str) -> bool:
+    # Queries made only of stopwords / single characters have nothing to look up
+    return bool(tokenize(query))
+
+
+class SearchIndex:
+    # In-process inverted index: term -> (doc numbers, field-weighted term frequencies), as
+    # parallel compact arrays ordered by doc number. Doc numbers index `_ids`; a removed or
+    # replaced product leaves a tombstone (None) that searches skip, and the arrays are
+    # compacted once tombstones pile up, so nothing per-document is kept besides its id.
+    def __init__(self, docs: List[dict] = ()):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._ids: List[Optional[str]] = []
+        self._numbers: Dict[str, int] = {}
+        self._tombstones = 0
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+        # term -> posting positions ordered by weight, built on first use so single-term
+        # queries can stop after `limit` hits instead of scoring every match
+        self._impact_ordered: Dict[str, array] = {}
+        for doc in docs:
+            self.add(doc)
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def add(self, doc: dict):
+        product_id = str(doc["_id"])
+        if product_id in self._numbers:
+            self.remove(product_id)
+
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in SEARCH_FIELD_WEIGHTS.items():
+            for term in tokenize(_field_text(doc, field)):
+                weights[term] += weight
+
+        number = len(self._ids)
+        self._ids.append(product_id)
+        self._numbers[product_id] = number
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("f"))
+                self._vocab_dirty = True
+            # Numbers only grow, so appending keeps every posting list sorted
+            postings[0].append(number)
+            postings[1].append(weight)
+            self._impact_ordered.pop(term, None)
+
+    def remove(self, product_id: str):
+        number = self._numbers.pop(product_id, None)
+        if number is None:
+            return
+        self._ids[number] = None
+        self._tombstones += 1
+        if self._tombstones > max(SEARCH_COMPACT_MIN_TOMBSTONES, len(self._numbers) // 4):
+            self._compact()
+
+    def _compact(self):
+        # Drops tombstoned postings and renumbers the live docs densely (order is kept)
+        renumber = array("i", [-1]) * len(self._ids)
+        ids = []
+        for number, product_id in enumerate(self._ids):
+            if product_id is not None:
+                renumber[number] = len(ids)
+                ids.append(product_id)
+        for term in list(self._postings):
+            docs, weights = self._postings[term]
+            live = [(renumber[d], w) for d, w in zip(docs, weights) if renumber[d] >= 0]
+            if live:
+                self._postings[term] = (array("I", [d for d, _ in live]), array("f", [w for _, w in live]))
+            else:
+                del self._postings[term]
+                self._vocab_dirty = True
+        self._ids = ids
+        self._numbers = {product_id: number for number, product_id in enumerate(ids)}
+        self._tombstones = 0
+        self._impact_ordered.clear()
+
+    def _expand(self, token: str) -> List[str]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        terms = []
+        i = bisect_left(self._vocab, token)
+        while i < len(self._vocab) and self._vocab[i].startswith(token) and len(terms) < SEARCH_MAX_PREFIX_EXPANSIONS:
+            term = self._vocab[i]
+            # Terms left with only tombstones mustn't use up the expansion cap
+            if not self._tombstones or any(self._ids[d] is not None for d in self._postings[term][0]):
+                terms.append(term)
+            i += 1
+        return terms
+
+    def _ordered(self, term: str) -> array:
+        ordered = self._impact_ordered.get(term)
+        if ordered is None:
+            weights = self._postings[term][1]
+            ordered = array("I", sorted(range(len(weights)), key=lambda i: -weights[i]))
+            self._impact_ordered[term] = ordered
+        return ordered
+
+    def _term_scale(self, term: str, token: str, total: int) -> float:
+        # Document frequency counts tombstones until the next compaction; close enough for ranking
+        idf = math.log(1 + total / len(self._postings[term][0]))
+        return idf * (1.0 if term == token else PREFIX_MATCH_FACTOR)
+
+    def search(self, query: str, limit: int = 100, within: Optional[Container[str]] = None) -> List[str]:
+        # Every query token must match (as a whole word or a prefix, for typeahead);
+        # results are ranked by field-weighted tf-idf. `within` restricts matches to those ids
+        # (e.g. one category) before the limit is applied, not after.
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        total = len(self._numbers) or 1
+
+        expansions = []
+        for token in tokens:
+            terms = self._expand(token)
+            if not terms:
+                return []
+            scales = {term: self._term_scale(term, token, total) for term in terms}
+            expansions.append((sum(len(self._postings[t][0]) for t in terms), scales))
+        # Rarest token first: it bounds the candidate set the others are checked against
+        expansions.sort(key=lambda item: item[0])
+
+        if len(expansions) == 1:
+            return self._top_single(expansions[0][1], limit, within)
+
+        ids = self._ids
+        _, first = expansions[0]
+        scores: Dict[int, float] = {}
+        for term, scale in first.items():
+            docs, weights = self._postings[term]
+            for number, weight in zip(docs, weights):
+                product_id = ids[number]
+                if product_id is None or (within is not None and product_id not in within):
+                    continue
+                s = weight * scale
+                if s > scores.get(number, 0.0):
+                    scores[number] = s
+
+        for _, scales in expansions[1:]:
+            postings = [(*self._postings[term], scale) for term, scale in scales.items()]
+            narrowed = {}
+            for number, s in scores.items():
+                best = 0.0
+                for docs, weights, scale in postings:
+                    i = bisect_left(docs, number)
+                    if i < len(docs) and docs[i] == number and weights[i] * scale > best:
+                        best = weights[i] * scale
+                if best:
+                    narrowed[number] = s + best
+            scores = narrowed
+            if not scores:
+                return []
+
+        return [ids[number] for number, _ in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+    def _top_single(self, scales: Dict[str, float], limit: int, within: Optional[Container[str]] = None) -> List[str]:
+        # Merge the impact-ordered postings of each expansion, highest score first; a product
+        # matched by several expansions keeps its first (best) score
+        def stream(term: str, scale: float):
+            docs, weights = self._postings[term]
+            return ((-weights[i] * scale, docs[i]) for i in self._ordered(term))
+
+        ids = self._ids
+        results, seen = [], set()
+        for _, number in heapq.merge(*(stream(term, scale) for term, scale in scales.items())):
+            product_id = ids[number]
+            if product_id is None or (within is not None and product_id not in within):
+                continue
+            if number not in seen:
+                seen.add(number)
+                results.append(product_id)
+                if len(results) >= limit:
+                    break
+        return results
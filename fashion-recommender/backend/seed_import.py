@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from passwords import PasswordHasher
+
+logger = logging.getLogger(__name__)
+
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "1000"))
+SEED_KINDS = ("products", "collections", "users")
+# NDJSON records name their target with this key: {"_kind": "products", "name": ...}
+KIND_FIELD = "_kind"
+
+
+class SeedFormatError(ValueError):
+    pass
+
+
+def _prepare(kind: str, doc: dict) -> dict:
+    d = dict(doc)
+    d.pop(KIND_FIELD, None)
+    now = datetime.now()
+    if kind == "users":
+        d["createdAt"] = now
+        d["updatedAt"] = now
+    else:
+        # Products and collections get fresh ObjectIds, same as /seed always did
+        d.pop("_id", None)
+        d.pop("id", None)
+        d["createdAt"] = now
+    return d
+
+
+def records_from_seed(seed: dict) -> Iterable[tuple]:
+    # {"products": [...], "collections": [...], "users": [...]} -> (kind, doc) pairs
+    for kind in SEED_KINDS:
+        for doc in seed.get(kind) or []:
+            yield kind, doc
+
+
+def record_from_line(line: str) -> Optional[tuple]:
+    line = line.strip()
+    if not line:
+        return None
+    doc = json.loads(line)
+    kind = doc.get(KIND_FIELD) if isinstance(doc, dict) else None
+    if kind not in SEED_KINDS:
+        raise SeedFormatError(f"Each NDJSON record needs {KIND_FIELD} set to one of {', '.join(SEED_KINDS)}")
+    return kind, doc
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer.strip():
+        yield buffer.decode("utf-8")
+
+
+class SeedImporter:
+    def __init__(self, collections: Dict[str, object], hasher: Optional[PasswordHasher] = None,
+                 batch_size: int = SEED_BATCH_SIZE, on_progress: Optional[Callable[[dict], None]] = None,
+                 reset: bool = False):
+        self.collections = collections
+        self.batch_size = max(1, batch_size)
+        self.on_progress = on_progress
+        # Dedicated pool by default so a large import can't starve logins of hashing slots
+        self._owns_hasher = hasher is None
+        self.hasher = hasher or PasswordHasher(max_pending=self.batch_size)
+        self._buffers: Dict[str, List[dict]] = {kind: [] for kind in SEED_KINDS}
+        self.inserted = {kind: 0 for kind in SEED_KINDS}
+        self.errors = 0
+        self.started_at = None
+        # reset=True clears the collections just before the first write, i.e. only once the first
+        # batch has parsed; a malformed body that fails earlier leaves the database untouched
+        self._reset_pending = reset
+        # Whether anything was deleted or written (callers skip cache invalidation otherwise)
+        self.touched = False
+
+    async def reset(self):
+        self._reset_pending = False
+        self.touched = True
+        for kind in SEED_KINDS:
+            await self.collections[kind].delete_many({})
+
+    async def add(self, kind: str, doc: dict):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        buffer = self._buffers[kind]
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            await self._flush(kind)
+
+    async def import_records(self, records) -> dict:
+        try:
+            if hasattr(records, "__aiter__"):
+                async for kind, doc in records:
+                    await self.add(kind, doc)
+            else:
+                for kind, doc in records:
+                    await self.add(kind, doc)
+            for kind in SEED_KINDS:
+                await self._flush(kind)
+            if self._reset_pending:
+                # Valid but empty input still replaces the data, as an upfront reset would have
+                await self.reset()
+        finally:
+            if self._owns_hasher:
+                self.hasher.shutdown()
+        return self.progress()
+
+    async def _flush(self, kind: str):
+        batch = self._buffers[kind]
+        if not batch:
+            return
+        self._buffers[kind] = []
+
+        docs = [_prepare(kind, doc) for doc in batch]
+        if kind == "users":
+            await self._hash_passwords(docs)
+
+        if self._reset_pending:
+            await self.reset()
+        self.touched = True
+        try:
+            result = await self.collections[kind].insert_many(docs, ordered=False)
+            self.inserted[kind] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: everything except the failing documents went in
+            self.inserted[kind] += e.details.get("nInserted", 0)
+            self.errors += len(e.details.get("writeErrors", []))
+            logger.warning(f"Seed batch for {kind}: {len(e.details.get('writeErrors', []))} documents rejected")
+
+        if self.on_progress:
+            self.on_progress(self.progress())
+
+    async def _hash_passwords(self, users: List[dict]):
+        with_password = [u for u in users if "password" in u]
+        hashes = await asyncio.gather(*(self.hasher.hash(u["password"]) for u in with_password))
+        for user, hashed in zip(with_password, hashes):
+            user["password"] = hashed
+
+    def progress(self) -> dict:
+        seconds = time.perf_counter() - self.started_at if self.started_at else 0.0
+        total = sum(self.inserted.values())
+        return {
+            "inserted": dict(self.inserted),
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rowsPerSec": round(total / seconds, 1) if seconds else 0.0,
+        }
+
+
+# --- CLI ---
+#
+#   python seed_import.py catalog.ndjson --batch-size 2000
+#   python seed_import.py ../static-db.json --no-reset
+
+async def _file_records(path: str):
+    if path.endswith(".json"):
+        with open(path) as f:
+            for record in records_from_seed(json.load(f)):
+                yield record
+        return
+    with open(path) as f:
+        for line in f:
+            record = record_from_line(line)
+            if record:
+                yield record
+
+
+async def _main(args):
+    from database import (
+        product_collection, collection_collection, user_collection, catalog_meta_collection,
+        recommendation_cache_collection, precomputed_outfit_collection
+    )
+    from catalog import bump_catalog_version
+
+    def report(progress):
+        print(f"{progress['inserted']} errors={progress['errors']} {progress['rowsPerSec']} rows/sec", flush=True)
+
+    hasher = PasswordHasher(kind=args.pool, max_pending=args.batch_size)
+    importer = SeedImporter(
+        {"products": product_collection, "collections": collection_collection, "users": user_collection},
+        hasher=hasher,
+        batch_size=args.batch_size,
+        on_progress=report,
+        reset=not args.no_reset
+    )
+    try:
+        summary = await importer.import_records(_file_records(args.path))
+    finally:
+        hasher.shutdown()
+
+    # Running workers pick the new catalog up through the version stamp
+    await bump_catalog_version(catalog_meta_collection)
+    await recommendation_cache_collection.delete_many({})
+    await precomputed_outfit_collection.delete_many({})
+    print(json.dumps({"summary": summary}))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bulk-load products, collections and users")
+    parser.add_argument("path", help="NDJSON file (records tagged with _kind) or a .json seed file")
+    parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    parser.add_argument("--pool", choices=["thread", "process"], default="thread", help="Password hashing pool")
+    parser.add_argument("--no-reset", action="store_true", help="Append instead of replacing existing data")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,217 @@
+import os
+import copy
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
+
+from pymongo import ReplaceOne
+
+from carts import CartStore
+from wishlists import WishlistStore
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps hot carts and wishlists in this process and writes them back in batches.
+# Each user's session must stick to one worker (single worker, or sticky load balancing):
+# another worker would read a copy up to SESSION_FLUSH_SECONDS stale, and its write-back wins.
+SESSION_STORE = os.getenv("SESSION_STORE", "")
+# Upper bound on how stale Mongo can be relative to memory
+SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "5"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+
+class WriteBehindDocuments:
+    # One document per user, kept in LRU order. Mutations only mark the user dirty; a
+    # background loop writes all dirty documents in a single bulk_write, so any number of
+    # clicks between two flushes cost one write.
+    def __init__(self, collection, empty: Callable[[str], dict], flush_seconds: float = SESSION_FLUSH_SECONDS,
+                 max_entries: int = SESSION_MAX_ENTRIES):
+        self.collection = collection
+        self.empty = empty
+        self.flush_seconds = flush_seconds
+        self.max_entries = max_entries
+        self._docs: "OrderedDict[str, dict]" = OrderedDict()
+        self._dirty = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.loads = 0
+        self.mutations = 0
+        self.flushes = 0
+        self.documents_written = 0
+        self.flush_errors = 0
+
+    async def load(self, user_id: str) -> dict:
+        doc = self._docs.get(user_id)
+        if doc is not None:
+            self._docs.move_to_end(user_id)
+            self.hits += 1
+            return doc
+
+        stored = await self.collection.find_one({"userId": user_id})
+        self.loads += 1
+        # Another request for the same user may have loaded (and mutated) it meanwhile
+        doc = self._docs.get(user_id)
+        if doc is None:
+            # A user with no document yet gets an in-memory one; it's only written once it changes
+            doc = stored or self.empty(user_id)
+            self._docs[user_id] = doc
+            self._evict()
+        return doc
+
+    def mark_dirty(self, user_id: str):
+        self.mutations += 1
+        self._dirty.add(user_id)
+
+    def _evict(self):
+        # Only clean entries can go; dirty ones leave after their next flush
+        if len(self._docs) <= self.max_entries:
+            return
+        for user_id in list(self._docs):
+            if len(self._docs) <= self.max_entries:
+                break
+            if user_id not in self._dirty:
+                del self._docs[user_id]
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            user_ids, self._dirty = list(self._dirty), set()
+            # Copies: the driver encodes off the event loop while requests keep mutating
+            requests = []
+            for user_id in user_ids:
+                doc = copy.deepcopy(self._docs[user_id])
+                doc.pop("_id", None)
+                requests.append(ReplaceOne({"userId": user_id}, doc, upsert=True))
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except Exception as e:
+                self._dirty.update(user_ids)
+                self.flush_errors += 1
+                logger.error(f"Session flush to {self.collection.name} failed, will retry: {e}")
+                return 0
+            self.flushes += 1
+            self.documents_written += len(requests)
+            self._evict()
+            return len(requests)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Graceful shutdown: nothing buffered is lost
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection.name,
+            "entries": len(self._docs),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "loads": self.loads,
+            "mutations": self.mutations,
+            "flushes": self.flushes,
+            "documentsWritten": self.documents_written,
+            "flushErrors": self.flush_errors,
+        }
+
+
+def _empty_cart(user_id: str) -> dict:
+    return {"userId": user_id, "items": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}
+
+
+def _empty_wishlist(user_id: str) -> dict:
+    return {"userId": user_id, "products": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}
+
+
+class SessionCartStore:
+    # Same interface as CartStore, served from WriteBehindDocuments. A user without a stored
+    # cart has an empty one in memory, so update() returns it instead of raising CartNotFound.
+    def __init__(self, docs: WriteBehindDocuments):
+        self.docs = docs
+
+    async def get(self, user_id: str) -> dict:
+        return await self.docs.load(user_id)
+
+    async def add(self, user_id: str, item: dict) -> dict:
+        cart = await self.docs.load(user_id)
+        existing = next((i for i in cart["items"] if i["productId"] == item["productId"]), None)
+        if existing:
+            existing["quantity"] += item["quantity"]
+        else:
+            cart["items"].append(dict(item))
+        self._touch(user_id, cart)
+        return cart
+
+    async def update(self, user_id: str, item: dict) -> dict:
+        cart = await self.docs.load(user_id)
+        if item["quantity"] > 0:
+            existing = next((i for i in cart["items"] if i["productId"] == item["productId"]), None)
+            if existing is None:
+                return cart
+            existing["quantity"] = item["quantity"]
+            for key in ("size", "color"):
+                if item.get(key):
+                    existing[key] = item[key]
+        else:
+            cart["items"] = [i for i in cart["items"] if i["productId"] != item["productId"]]
+        self._touch(user_id, cart)
+        return cart
+
+    async def clear(self, user_id: str, session=None):
+        # Not part of a checkout transaction; the cleared cart is written by the next flush
+        cart = await self.docs.load(user_id)
+        cart["items"] = []
+        self._touch(user_id, cart)
+
+    def _touch(self, user_id: str, cart: dict):
+        cart["updatedAt"] = datetime.now()
+        self.docs.mark_dirty(user_id)
+
+
+class SessionWishlistStore:
+    # Same interface as WishlistStore
+    def __init__(self, docs: WriteBehindDocuments):
+        self.docs = docs
+
+    async def get(self, user_id: str) -> dict:
+        return await self.docs.load(user_id)
+
+    async def add(self, user_id: str, product_id: str):
+        wishlist = await self.docs.load(user_id)
+        if product_id not in wishlist["products"]:
+            wishlist["products"].append(product_id)
+            wishlist["updatedAt"] = datetime.now()
+            self.docs.mark_dirty(user_id)
+
+    async def remove(self, user_id: str, product_id: str):
+        wishlist = await self.docs.load(user_id)
+        if product_id in wishlist["products"]:
+            wishlist["products"].remove(product_id)
+            wishlist["updatedAt"] = datetime.now()
+            self.docs.mark_dirty(user_id)
+
+
+def build_session_stores(cart_collection, wishlist_collection, mode: str = SESSION_STORE):
+    # -> (carts, wishlists, write-behind tiers to start/stop); direct Mongo stores unless mode == "memory"
+    if mode != "memory":
+        return CartStore(cart_collection), WishlistStore(wishlist_collection), []
+    cart_docs = WriteBehindDocuments(cart_collection, _empty_cart)
+    wishlist_docs = WriteBehindDocuments(wishlist_collection, _empty_wishlist)
+    return SessionCartStore(cart_docs), SessionWishlistStore(wishlist_docs), [cart_docs, wishlist_docs]
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    # Deduplicates concurrent calls: callers with the same key share one execution.
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            # Run as a task so a disconnecting leader doesn't cancel the work for everyone else
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def drain(self, timeout: float):
+        # Let in-flight executions finish (e.g. on shutdown), up to `timeout` seconds
+        tasks = list(self._calls.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "inFlight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# Keyword rules, checked in order (FullBody before Tops so "Kurta Set" isn't a Top)
+SLOT_KEYWORDS = [
+    ("FullBody", ["set", "suit", "sherwani", "pajama", "co-ords", "overall", "jumpsuit"]),
+    ("Bottoms", ["jeans", "trouser", "pant", "chinos", "jogger", "short", "bottom", "skirt", "legging"]),
+    ("Outerwear", ["jacket", "blazer", "coat", "bandhgala", "vest", "cardigan"]),
+    ("Tops", ["shirt", "top", "tee", "t-shirt", "kurta", "tunic", "blouse"]),
+    ("Shoes", ["shoe", "sneaker", "boot", "sandal", "footwear", "heel", "flat"]),
+]
+DEFAULT_SLOT = "Accessories"
+SLOTS = [slot for slot, _ in SLOT_KEYWORDS] + [DEFAULT_SLOT]
+
+# Which slots complete an outfit for a given hero slot
+COMPLEMENTARY_SLOTS = {
+    "Tops": ["Bottoms", "Outerwear"],
+    "Bottoms": ["Tops", "Outerwear"],
+    "Outerwear": ["Tops", "Bottoms"],
+    "FullBody": ["Outerwear"],
+}
+DEFAULT_COMPLEMENTARY_SLOTS = ["Tops", "Bottoms"]
+# Sets pair with outerwear plus formal shirts (e.g. a shirt under a suit)
+FULLBODY_TOP_HINTS = ["formal"]
+
+# Rule-based outfit used when there are no candidates or the LLM fails: (slots, item count)
+FALLBACK_RULES = {
+    "Tops": (["Bottoms"], 3),
+    "Bottoms": (["Tops"], 3),
+    "Outerwear": (["Tops"], 2),
+}
+DEFAULT_FALLBACK_RULE = (["Tops", "Bottoms"], 3)
+
+
+def classify_category(category: str) -> str:
+    category = (category or "").lower()
+    for slot, keywords in SLOT_KEYWORDS:
+        if any(x in category for x in keywords):
+            return slot
+    return DEFAULT_SLOT
+
+
+class CategoryTaxonomy:
+    # Built from the distinct categories in the catalog; all lookups are dict hits
+    def __init__(self, categories: Iterable[str]):
+        self.slot_by_category: Dict[str, str] = {}
+        self.categories_by_slot: Dict[str, List[str]] = defaultdict(list)
+        for category in sorted({c for c in categories if isinstance(c, str) and c}):
+            slot = classify_category(category)
+            self.slot_by_category[category] = slot
+            self.categories_by_slot[slot].append(category)
+
+        self._complementary: Dict[str, List[str]] = {}
+        self._fallback: Dict[str, Tuple[List[str], int]] = {}
+        for slot in SLOTS:
+            categories_for = []
+            for other in COMPLEMENTARY_SLOTS.get(slot, DEFAULT_COMPLEMENTARY_SLOTS):
+                categories_for.extend(self.categories_by_slot.get(other, []))
+            if slot == "FullBody":
+                categories_for.extend(
+                    c for c in self.categories_by_slot.get("Tops", [])
+                    if any(hint in c.lower() for hint in FULLBODY_TOP_HINTS)
+                )
+            self._complementary[slot] = categories_for
+
+            fallback_slots, limit = FALLBACK_RULES.get(slot, DEFAULT_FALLBACK_RULE)
+            fallback_categories = []
+            for other in fallback_slots:
+                fallback_categories.extend(self.categories_by_slot.get(other, []))
+            self._fallback[slot] = (fallback_categories, limit)
+
+    def slot_of(self, category: str) -> str:
+        slot = self.slot_by_category.get(category)
+        if slot is None:
+            # Category not in the catalog (e.g. an ad-hoc hero product). Not memoized, so
+            # arbitrary request input can't grow the table.
+            slot = classify_category(category)
+        return slot
+
+    def complementary_categories(self, slot: str) -> List[str]:
+        return self._complementary.get(slot, self._complementary[DEFAULT_SLOT])
+
+    def fallback_categories(self, slot: str) -> Tuple[List[str], int]:
+        return self._fallback.get(slot, self._fallback[DEFAULT_SLOT])
+
+    def __len__(self):
+        return len(self.slot_by_category)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from precompute import PrecomputeJob
+
+# Unit tests for the batch job (no Mongo or server needed):
+#
+#   pip install -r requirements-dev.txt
+#   python -m pytest -q test_precompute.py
+
+PRODUCTS = [{"_id": f"p{i}", "name": f"Product {i}", "category": "Shirts"} for i in range(5)]
+
+
+async def build(product, occasion, gender):
+    return {"items": [{"_id": "i1"}, {"_id": "i2"}], "explanation": "ok", "style_tips": []}, True
+
+
+class FailingCursor:
+    # Yields a couple of products, then fails like a dropped Mongo cursor
+    def __init__(self, products, fail_after: int):
+        self.products = products
+        self.fail_after = fail_after
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, product in enumerate(self.products):
+            if i == self.fail_after:
+                raise RuntimeError("cursor died")
+            yield product
+
+
+class Store:
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.docs = {}
+
+    async def replace_one(self, query, doc, upsert=False):
+        if doc["productId"] in self.fail_for:
+            raise RuntimeError("write failed")
+        self.docs[query["_id"]] = doc
+
+
+async def collect(job, products, occasions=("Party",), genders=("Men",)):
+    return [row async for row in job.run(products, list(occasions), list(genders))]
+
+
+def run(coro):
+    # Bounded, so a regression shows up as a failure rather than a hung test run
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_all_combinations_succeed():
+    store = Store()
+    job = PrecomputeJob(build, store=store, concurrency=2)
+    rows = run(collect(job, PRODUCTS, genders=("Men", "Women")))
+    assert len(rows) == 10
+    assert all(row["ok"] and row["persisted"] for row in rows)
+    assert job.summary()["succeeded"] == 10
+    assert len(store.docs) == 10
+
+
+def test_failing_cursor_raises_instead_of_hanging():
+    job = PrecomputeJob(build, concurrency=3)
+    rows = []
+
+    async def consume():
+        async for row in job.run(FailingCursor(PRODUCTS, fail_after=2), ["Party"], ["Men"]):
+            rows.append(row)
+
+    with pytest.raises(RuntimeError, match="cursor died"):
+        run(consume())
+    # Combinations read before the failure were still processed
+    assert len(rows) == 2
+    assert job.finished_at is not None
+
+
+def test_failing_store_counts_as_failed_item():
+    store = Store(fail_for={"p1", "p3"})
+    job = PrecomputeJob(build, store=store, concurrency=2)
+    rows = run(collect(job, PRODUCTS))
+    assert len(rows) == 5
+    failed = sorted(row["productId"] for row in rows if not row["ok"])
+    assert failed == ["p1", "p3"]
+    assert all("write failed" in row["error"] for row in rows if not row["ok"])
+    summary = job.summary()
+    assert (summary["succeeded"], summary["failed"], summary["persisted"]) == (3, 2, 3)
+
+
+def test_failing_build_counts_as_failed_item():
+    async def flaky(product, occasion, gender):
+        if product["_id"] == "p0":
+            raise ValueError("no candidates")
+        return await build(product, occasion, gender)
+
+    job = PrecomputeJob(flaky, concurrency=2)
+    rows = run(collect(job, PRODUCTS))
+    assert [row["ok"] for row in rows].count(False) == 1
+    assert job.summary()["failed"] == 1
@@ -0,0 +1,11 @@
+import re
+from typing import List
+
+# Shared by the ranking encoder and the search index; kept free of numpy so the search
+# index (and anything importing it) stays cheap to import
+STOPWORDS = {"a", "an", "and", "the", "with", "for", "of", "in", "to", "on", "by", "is", "its", "this", "that"}
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 1]
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class WishlistStore:
+    # Wishlist documents hold product ids only; hydration happens in the endpoint
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id: str) -> dict:
+        wishlist = await self.collection.find_one({"userId": user_id})
+        if wishlist:
+            return wishlist
+        try:
+            return await self.collection.find_one_and_update(
+                {"userId": user_id},
+                {"$setOnInsert": {"products": [], "createdAt": datetime.now(), "updatedAt": datetime.now()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return await self.collection.find_one({"userId": user_id})
+
+    async def add(self, user_id: str, product_id: str):
+        now = datetime.now()
+        await self.collection.update_one(
+            {"userId": user_id},
+            {"$addToSet": {"products": product_id}, "$set": {"updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+            upsert=True
+        )
+
+    async def remove(self, user_id: str, product_id: str):
+        await self.collection.update_one({"userId": user_id}, {"$pull": {"products": product_id}, "$set": {"updatedAt": datetime.now()}})